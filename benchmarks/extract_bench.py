@@ -0,0 +1,116 @@
+"""Compare HTML extraction throughput and output size on saved pages.
+
+Usage:
+    python benchmarks/extract_bench.py [--fixtures DIR] [--rounds N]
+
+``regex`` is the previous crawler pipeline (regex title/text + HTMLParser
+links), ``lxml`` is ``gastric_agent.html_extract.extract_page`` and
+``trafilatura`` is shown as a reference for main-content quality.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from html import unescape
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urljoin
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from gastric_agent.html_extract import extract_page  # noqa: E402
+
+BASE_URL = "https://www.example.com/health/stomach/"
+DEFAULT_FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag.lower() != "a":
+            return
+        for name, value in attrs:
+            if name.lower() == "href" and value:
+                self.links.append(value)
+                break
+
+
+def regex_extract(html: str) -> tuple[str, str, list[str]]:
+    match = re.search(r"<title[^>]*>(.*?)</title>", html, flags=re.IGNORECASE | re.DOTALL)
+    title = unescape(re.sub(r"\s+", " ", match.group(1)).strip()) if match else ""
+
+    cleaned = re.sub(
+        r"<script[\s\S]*?</script>|<style[\s\S]*?</style>", " ", html, flags=re.IGNORECASE
+    )
+    cleaned = re.sub(r"<[^>]+>", " ", cleaned)
+    cleaned = unescape(cleaned)
+    text = re.sub(r"\s+", " ", cleaned).strip()
+
+    parser = _LinkParser()
+    parser.feed(html)
+    links = []
+    for raw_href in parser.links:
+        href = raw_href.strip()
+        absolute = urljoin(BASE_URL, href) if href else ""
+        if absolute.startswith("http"):
+            links.append(absolute)
+    return title, text, links
+
+
+def lxml_extract(html: str) -> tuple[str, str, list[str]]:
+    page = extract_page(BASE_URL, html)
+    return page.title, page.text, page.links
+
+
+def trafilatura_extract(html: str) -> tuple[str, str, list[str]]:
+    import trafilatura
+
+    text = trafilatura.extract(html, include_comments=False, include_tables=True) or ""
+    return "", text, []
+
+
+EXTRACTORS: dict[str, Callable[[str], tuple[str, str, list[str]]]] = {
+    "regex": regex_extract,
+    "lxml": lxml_extract,
+    "trafilatura": trafilatura_extract,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=str(DEFAULT_FIXTURES))
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = [path.read_text(encoding="utf-8") for path in sorted(Path(args.fixtures).glob("*.html"))]
+    if not pages:
+        raise SystemExit(f"No *.html fixtures in {args.fixtures}")
+    input_chars = sum(len(page) for page in pages)
+
+    print(f"{len(pages)} pages, {input_chars} input chars, {args.rounds} rounds")
+    print(f"{'extractor':<12} {'pages/sec':>10} {'text chars':>11} {'links':>6}")
+    for name, extract in EXTRACTORS.items():
+        text_chars = links = 0
+        for html in pages:
+            _, text, found = extract(html)
+            text_chars += len(text)
+            links += len(found)
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            for html in pages:
+                extract(html)
+        elapsed = time.perf_counter() - started
+        rate = len(pages) * args.rounds / elapsed
+        print(f"{name:<12} {rate:>10.0f} {text_chars:>11} {links:>6}")
+
+
+if __name__ == "__main__":
+    main()
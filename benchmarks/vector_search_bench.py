@@ -0,0 +1,103 @@
+"""Compare Chroma HNSW queries with the in-process numpy vector index.
+
+Usage:
+    python benchmarks/vector_search_bench.py [--chunks N] [--dim D] [--queries Q]
+        [--threads T] [--k K]
+
+Random unit vectors are written to a temporary Chroma collection, exported
+with ``gastric_agent.dense_index.export_dense_index`` and queried both ways:
+one query at a time, then from ``T`` threads at once (where the numpy index
+answers queued queries with one matrix product). ``recall`` is the share of
+the exact top-k that Chroma's approximate search returns.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import chromadb
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from gastric_agent.dense_index import NumpyVectorIndex, export_dense_index  # noqa: E402
+
+ADD_BATCH = 5000
+
+
+def _timed(
+    search: Callable[[np.ndarray], list[str]], queries: np.ndarray, threads: int
+) -> tuple[float, list[list[str]]]:
+    started = time.perf_counter()
+    if threads <= 1:
+        results = [search(query) for query in queries]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(search, queries))
+    return len(queries) / (time.perf_counter() - started), results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Queries near stored vectors, like real questions near their answers.
+    queries = vectors[rng.integers(0, args.chunks, args.queries)]
+    noise = rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(args.dim)
+    queries = queries + 0.5 * noise
+    ids = [f"c{i}" for i in range(args.chunks)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        collection = chromadb.PersistentClient(path=directory).get_or_create_collection(
+            "gastric_knowledge"
+        )
+        for start in range(0, args.chunks, ADD_BATCH):
+            end = start + ADD_BATCH
+            collection.add(
+                ids=ids[start:end],
+                embeddings=vectors[start:end],
+                documents=[f"chunk {i}" for i in range(start, min(end, args.chunks))],
+            )
+        started = time.perf_counter()
+        export_dense_index(collection, directory)
+        export_seconds = time.perf_counter() - started
+        index = NumpyVectorIndex(directory)
+
+        def chroma_search(query: np.ndarray) -> list[str]:
+            return collection.query(query_embeddings=[query], n_results=args.k)["ids"][0]
+
+        def numpy_search(query: np.ndarray) -> list[str]:
+            return [doc.id for doc, _ in index.search(query, args.k)]
+
+        print(
+            f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, "
+            f"k={args.k}, export {export_seconds:.2f}s"
+        )
+        print(f"{'backend':<8} {'threads':>7} {'queries/sec':>12} {'recall':>7}")
+        for threads in (1, args.threads):
+            _, exact = _timed(numpy_search, queries, 1)
+            for name, search in (("chroma", chroma_search), ("numpy", numpy_search)):
+                search(queries[0])
+                rate, results = _timed(search, queries, threads)
+                recall = np.mean(
+                    [len(set(got) & set(want)) / len(want) for got, want in zip(results, exact)]
+                )
+                print(f"{name:<8} {threads:>7} {rate:>12.0f} {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any
+
+import numpy as np
+
+from .config import get_config
+
+
+@dataclass
+class CachedAnswer:
+    response: Any
+    streamed_reasoning: str
+    created_at: float
+
+
+class AnswerCache:
+    """Semantic cache of generated answers keyed by question embedding.
+
+    Entries are partitioned by ``(think_mode, kb_version)`` so a rebuilt
+    knowledge base never serves answers generated from the old index. Within
+    a partition the most similar question above ``threshold`` (cosine) wins.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.97,
+        max_entries: int = 512,
+        ttl_seconds: float = 24 * 3600,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[tuple[bool, str], np.ndarray, CachedAnswer]] = (
+            OrderedDict()
+        )
+        self._next_id = 0
+        self._lock = Lock()
+
+    def lookup(
+        self, embedding: list[float], think_mode: bool, kb_version: str
+    ) -> CachedAnswer | None:
+        query = _unit(embedding)
+        partition = (think_mode, kb_version)
+        now = time.time()
+        best_id = -1
+        best_score = self.threshold
+        with self._lock:
+            for entry_id, (entry_partition, vector, cached) in list(self._entries.items()):
+                if self.ttl_seconds > 0 and now - cached.created_at > self.ttl_seconds:
+                    del self._entries[entry_id]
+                    continue
+                if entry_partition != partition:
+                    continue
+                score = float(np.dot(query, vector))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id < 0:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def store(
+        self,
+        embedding: list[float],
+        think_mode: bool,
+        kb_version: str,
+        response: Any,
+        streamed_reasoning: str,
+    ) -> None:
+        cached = CachedAnswer(
+            response=response,
+            streamed_reasoning=streamed_reasoning,
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._entries[self._next_id] = ((think_mode, kb_version), _unit(embedding), cached)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def _unit(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector = vector / norm
+    return vector
+
+
+_answer_cache: AnswerCache | None = None
+_answer_cache_lock = Lock()
+
+
+def get_answer_cache() -> AnswerCache | None:
+    """Process-wide answer cache, or ``None`` when ANSWER_CACHE_ENABLED is off."""
+    global _answer_cache
+    cfg = get_config()
+    if not cfg.answer_cache_enabled:
+        return None
+    if _answer_cache is not None:
+        return _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache(
+                threshold=cfg.answer_cache_threshold,
+                max_entries=cfg.answer_cache_size,
+                ttl_seconds=cfg.answer_cache_ttl_seconds,
+            )
+    return _answer_cache
@@ -25,6 +25,29 @@ class AppConfig:
     neo4j_uri: str
     neo4j_user: str
     neo4j_password: str
+    # Query embedding cache
+    embedding_cache_size: int
+    embedding_cache_ttl_seconds: float
+    embedding_cache_path: str
+    # Semantic answer cache
+    answer_cache_enabled: bool
+    answer_cache_threshold: float
+    answer_cache_size: int
+    answer_cache_ttl_seconds: float
+    # Graph-memory extraction job queue
+    memory_jobs_path: str
+    memory_jobs_workers: int
+    memory_jobs_batch_size: int
+    # Index build embedding requests
+    index_embed_batch_size: int
+    index_embed_concurrency: int
+    index_embed_rps: float
+    index_embedding_store_path: str
+    index_keep_versions: int
+    index_reload_interval_seconds: float
+    # Retrieval
+    retrieval_hybrid: bool
+    retrieval_backend: str
 
 
 _cached_config: AppConfig | None = None
@@ -60,6 +83,34 @@ def get_config() -> AppConfig:
         neo4j_uri=os.getenv("NEO4J_URI", "bolt://localhost:7687"),
         neo4j_user=os.getenv("NEO4J_USER", "neo4j"),
         neo4j_password=os.getenv("NEO4J_PASSWORD", "medical2025"),
+        embedding_cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+        embedding_cache_ttl_seconds=float(
+            os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "604800")
+        ),
+        embedding_cache_path=os.getenv("EMBEDDING_CACHE_PATH", ""),
+        answer_cache_enabled=os.getenv("ANSWER_CACHE_ENABLED", "false").lower()
+        in {"1", "true", "yes"},
+        answer_cache_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97")),
+        answer_cache_size=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+        answer_cache_ttl_seconds=float(
+            os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400")
+        ),
+        memory_jobs_path=os.getenv("MEMORY_JOBS_PATH", "data/memory_jobs.sqlite3"),
+        memory_jobs_workers=int(os.getenv("MEMORY_JOBS_WORKERS", "2")),
+        memory_jobs_batch_size=int(os.getenv("MEMORY_JOBS_BATCH_SIZE", "8")),
+        index_embed_batch_size=int(os.getenv("INDEX_EMBED_BATCH_SIZE", "10")),
+        index_embed_concurrency=int(os.getenv("INDEX_EMBED_CONCURRENCY", "4")),
+        index_embed_rps=float(os.getenv("INDEX_EMBED_RPS", "10")),
+        index_embedding_store_path=os.getenv(
+            "INDEX_EMBEDDING_STORE_PATH", "data/cache/chunk_embeddings.sqlite3"
+        ),
+        index_keep_versions=int(os.getenv("INDEX_KEEP_VERSIONS", "3")),
+        index_reload_interval_seconds=float(
+            os.getenv("INDEX_RELOAD_INTERVAL_SECONDS", "10")
+        ),
+        retrieval_hybrid=os.getenv("RETRIEVAL_HYBRID", "true").lower()
+        in {"1", "true", "yes"},
+        retrieval_backend=os.getenv("RETRIEVAL_BACKEND", "chroma").lower(),
     )
 
     missing = []
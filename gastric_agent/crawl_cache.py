@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+
+from .jsonl_store import sibling_path
+
+
+@dataclass
+class CachedPage:
+    url: str
+    etag: str
+    last_modified: str
+    content_hash: str
+    title: str
+    content: str
+    links: list[str]
+    fetched_at: float
+
+
+def content_hash(title: str, content: str) -> str:
+    return hashlib.sha256(f"{title}\0{content}".encode("utf-8")).hexdigest()
+
+
+class CrawlCache:
+    """Validators and extracted content of previously crawled pages.
+
+    A re-crawl sends ``If-None-Match``/``If-Modified-Since`` from the stored
+    ETag and Last-Modified headers. On 304 the stored title, text and links
+    are reused; a 200 whose extracted title and text hash the same as before
+    is also reported as unchanged, so rotating ads, timestamps or CSRF tokens
+    in the HTML do not trigger a re-embed. Shared by the crawler's fetch
+    threads.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                content_hash TEXT NOT NULL,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                links TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._lock = Lock()
+
+    def get(self, url: str) -> CachedPage | None:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT etag, last_modified, content_hash, title, content, links, fetched_at
+                FROM pages WHERE url = ?
+                """,
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedPage(
+            url=url,
+            etag=row[0],
+            last_modified=row[1],
+            content_hash=row[2],
+            title=row[3],
+            content=row[4],
+            links=json.loads(row[5]),
+            fetched_at=row[6],
+        )
+
+    def put(self, page: CachedPage) -> None:
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO pages
+                    (url, etag, last_modified, content_hash, title, content, links, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    page.url,
+                    page.etag,
+                    page.last_modified,
+                    page.content_hash,
+                    page.title,
+                    page.content,
+                    json.dumps(page.links, ensure_ascii=False),
+                    page.fetched_at,
+                ),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str, etag: str, last_modified: str) -> None:
+        """Refresh validators of an unchanged page."""
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE pages SET etag = ?, last_modified = ?, fetched_at = ? WHERE url = ?
+                """,
+                (etag, last_modified, time.time(), url),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def conditional_headers(page: CachedPage | None) -> dict[str, str]:
+    headers: dict[str, str] = {}
+    if page is None:
+        return headers
+    if page.etag:
+        headers["If-None-Match"] = page.etag
+    if page.last_modified:
+        headers["If-Modified-Since"] = page.last_modified
+    return headers
+
+
+def cache_path_for(output_path: str) -> str:
+    return sibling_path(output_path, "cache.sqlite3")
+
+
+def changed_urls_path_for(output_path: str) -> str:
+    return sibling_path(output_path, "changed.json")
+
+
+def write_changed_urls(path: str, changed: list[str], unchanged: list[str]) -> None:
+    """Write the accepted URLs of a crawl split by whether their content changed."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    payload = {"changed": changed, "unchanged": unchanged, "crawled_at": time.time()}
+    Path(path).write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def read_changed_urls(path: str) -> set[str]:
+    payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    return set(payload.get("changed", []))
+
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+from .jsonl_store import sibling_path
+
+if TYPE_CHECKING:
+    from .crawler import CrawlResult
+
+
+class CrawlCheckpoint:
+    """SQLite record of a crawl's frontier, visited URLs and accepted docs.
+
+    Each finished page is committed in one transaction: its URL leaves the
+    frontier, joins the visited set, and its document (if accepted) is
+    stored together with the links it discovered. URLs that were in flight
+    when the process stopped are still in the frontier and get fetched again
+    on resume; nothing that completed is re-fetched.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS frontier (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                depth INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS visited (url TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS docs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                changed INTEGER NOT NULL DEFAULT 1
+            );
+            """
+        )
+        self._conn.commit()
+
+    def reset(self) -> None:
+        self._conn.executescript(
+            "DELETE FROM frontier; DELETE FROM visited; DELETE FROM docs;"
+        )
+        self._conn.commit()
+
+    def is_empty(self) -> bool:
+        row = self._conn.execute(
+            "SELECT EXISTS(SELECT 1 FROM frontier) OR EXISTS(SELECT 1 FROM visited)"
+        ).fetchone()
+        return not row[0]
+
+    def load_frontier(self) -> list[tuple[str, int]]:
+        rows = self._conn.execute("SELECT url, depth FROM frontier ORDER BY seq").fetchall()
+        return [(url, depth) for url, depth in rows]
+
+    def load_visited(self) -> set[str]:
+        return {row[0] for row in self._conn.execute("SELECT url FROM visited")}
+
+    def count_docs(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def iter_docs(self) -> Iterator[CrawlResult]:
+        from .crawler import CrawlResult
+
+        cursor = self._conn.execute(
+            "SELECT url, title, content, changed FROM docs ORDER BY seq"
+        )
+        for url, title, content, changed in cursor:
+            yield CrawlResult(url=url, title=title, content=content, changed=bool(changed))
+
+    def add_frontier(self, urls: list[str], depth: int = 0) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO frontier (url, depth) VALUES (?, ?)",
+            [(url, depth) for url in urls],
+        )
+        self._conn.commit()
+
+    def record_page(
+        self,
+        url: str,
+        doc: CrawlResult | None = None,
+        links: list[str] | None = None,
+        link_depth: int = 0,
+    ) -> None:
+        """Mark ``url`` done, storing its accepted doc and newly queued links."""
+        with self._conn:
+            self._conn.execute("DELETE FROM frontier WHERE url = ?", (url,))
+            self._conn.execute("INSERT OR IGNORE INTO visited (url) VALUES (?)", (url,))
+            if doc is not None:
+                self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO docs (url, title, content, changed)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (doc.url, doc.title, doc.content, int(doc.changed)),
+                )
+            if links:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO frontier (url, depth) VALUES (?, ?)",
+                    [(link, link_depth) for link in links],
+                )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def checkpoint_path_for(output_path: str) -> str:
+    """Default checkpoint file next to the crawl output (``x.jsonl`` -> ``x.checkpoint.sqlite3``)."""
+    return sibling_path(output_path, "checkpoint.sqlite3")
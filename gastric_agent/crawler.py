@@ -1,18 +1,16 @@
 from __future__ import annotations
 
-import json
-import re
 import time
-from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from html import unescape
-from html.parser import HTMLParser
-from pathlib import Path
-from typing import Callable
-from urllib.parse import urljoin, urlparse
+from typing import Callable, Iterable, Iterator
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from .crawl_cache import CachedPage, CrawlCache, conditional_headers, content_hash
+from .crawl_checkpoint import CrawlCheckpoint
 from .data_sources import (
     DEFAULT_SEED_URLS,
     GASTRIC_KEYWORDS,
@@ -21,6 +19,21 @@ from .data_sources import (
     URL_TOPIC_HINTS,
     allowed_domains,
 )
+from .frontier import UrlFrontier
+from .html_extract import extract_page
+from .jsonl_store import JsonlWriter
+from .keyword_matcher import KeywordMatcher
+from .near_dup import NearDuplicateIndex
+
+_GASTRIC_MATCHER = KeywordMatcher(GASTRIC_KEYWORDS)
+_NEGATIVE_MATCHER = KeywordMatcher(NEGATIVE_TOPIC_KEYWORDS)
+_NOISE_URL_MATCHER = KeywordMatcher(NOISE_URL_HINTS)
+_TOPIC_URL_MATCHER = KeywordMatcher(URL_TOPIC_HINTS)
+# Priority lost per link hop from a seed; one topic hint in the URL is worth two hops.
+_DEPTH_PENALTY = 0.5
+
+# (saved, target, visited, queued, current_url, duplicates_dropped)
+ProgressCallback = Callable[[int, int, int, int, str, int], None]
 
 
 @dataclass
@@ -28,28 +41,44 @@ class CrawlResult:
     url: str
     title: str
     content: str
+    changed: bool = True
+
+    def to_record(self) -> dict[str, str]:
+        return {"url": self.url, "title": self.title, "content": self.content}
+
+
+class _DomainLimiter:
+    """Per-domain politeness: a concurrency cap and a minimum gap between starts."""
 
+    def __init__(self, interval: float, per_domain: int) -> None:
+        self.interval = interval
+        self.per_domain = per_domain
+        self._next_start: dict[str, float] = {}
+        self._in_flight: dict[str, int] = {}
 
-class _LinkParser(HTMLParser):
-    def __init__(self) -> None:
-        super().__init__()
-        self.links: list[str] = []
+    def wait_time(self, domain: str) -> float:
+        """Seconds until ``domain`` may start another request (0 when ready)."""
+        if self._in_flight.get(domain, 0) >= self.per_domain:
+            return self.interval or 0.05
+        return max(self._next_start.get(domain, 0.0) - time.monotonic(), 0.0)
 
-    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
-        if tag.lower() != "a":
-            return
-        for name, value in attrs:
-            if name.lower() == "href" and value:
-                self.links.append(value)
-                break
+    def acquire(self, domain: str) -> None:
+        self._in_flight[domain] = self._in_flight.get(domain, 0) + 1
+        self._next_start[domain] = time.monotonic() + self.interval
+
+    def release(self, domain: str) -> None:
+        self._in_flight[domain] -= 1
 
 
 class GastricCrawler:
     def __init__(
-        self, user_agent: str = "GastricRAGBot/1.0 (+local research use)"
+        self,
+        user_agent: str = "GastricRAGBot/1.0 (+local research use)",
+        cache: CrawlCache | None = None,
     ) -> None:
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": user_agent})
+        self.cache = cache
 
     def crawl(
         self,
@@ -57,126 +86,250 @@ class GastricCrawler:
         min_chars: int = 500,
         sleep_seconds: float = 0.3,
         seed_urls: list[str] | None = None,
-        on_progress: Callable[[int, int, int, int, str], None] | None = None,
+        on_progress: ProgressCallback | None = None,
+        concurrency: int = 1,
+        per_domain_concurrency: int = 2,
+        checkpoint: CrawlCheckpoint | None = None,
+        frontier_memory_cap: int = 50_000,
+        near_duplicates: NearDuplicateIndex | None = None,
     ) -> list[CrawlResult]:
+        """Collect :meth:`iter_crawl` into a list, including docs from a resumed checkpoint."""
+        results: list[CrawlResult] = []
+        if checkpoint is not None and not checkpoint.is_empty():
+            results.extend(checkpoint.iter_docs())
+        results.extend(
+            self.iter_crawl(
+                max_pages=max_pages,
+                min_chars=min_chars,
+                sleep_seconds=sleep_seconds,
+                seed_urls=seed_urls,
+                on_progress=on_progress,
+                concurrency=concurrency,
+                per_domain_concurrency=per_domain_concurrency,
+                checkpoint=checkpoint,
+                frontier_memory_cap=frontier_memory_cap,
+                near_duplicates=near_duplicates,
+            )
+        )
+        return results
+
+    def iter_crawl(
+        self,
+        max_pages: int = 120,
+        min_chars: int = 500,
+        sleep_seconds: float = 0.3,
+        seed_urls: list[str] | None = None,
+        on_progress: ProgressCallback | None = None,
+        concurrency: int = 1,
+        per_domain_concurrency: int = 2,
+        checkpoint: CrawlCheckpoint | None = None,
+        frontier_memory_cap: int = 50_000,
+        near_duplicates: NearDuplicateIndex | None = None,
+    ) -> Iterator[CrawlResult]:
+        """Crawl from the seeds, yielding each gastric page as it is accepted.
+
+        Stops once ``max_pages`` pages have been accepted. URLs are fetched
+        best first from a :class:`UrlFrontier`: more topic hints in the URL
+        and a smaller link depth rank higher, and domains take turns. Up to
+        ``concurrency`` fetches run at once on a thread pool sharing the
+        session. Each domain gets at most ``per_domain_concurrency`` requests
+        in flight and ``sleep_seconds`` between request starts. The frontier
+        keeps at most ``frontier_memory_cap`` URLs in memory and spills the
+        rest to disk.
+
+        ``on_progress`` receives ``(saved, target, visited, queued, url,
+        duplicates_dropped)`` after every page.
+
+        With ``near_duplicates`` a page whose text nearly matches an already
+        accepted page is not accepted (its links are still followed); the
+        index keeps the clusters for reporting.
+
+        With a ``checkpoint`` every finished page is recorded as it completes;
+        a non-empty checkpoint is resumed instead of starting from the seeds,
+        and its stored docs count towards ``max_pages`` but are not yielded.
+        """
         seeds = seed_urls or DEFAULT_SEED_URLS
         domain_allowlist = allowed_domains(seeds)
+        limiter = _DomainLimiter(sleep_seconds, max(per_domain_concurrency, 1))
+        concurrency = max(concurrency, 1)
+        self._size_connection_pool(concurrency)
 
-        queue = deque(seeds)
+        frontier = UrlFrontier(max_in_memory=frontier_memory_cap)
         visited: set[str] = set()
-        results: list[CrawlResult] = []
-
-        while queue and len(results) < max_pages:
-            current_url = queue.popleft()
-            normalized = self._normalize_url(current_url)
-            if not normalized or normalized in visited:
-                continue
-            visited.add(normalized)
-
-            if not self._domain_allowed(normalized, domain_allowlist):
-                continue
-            if self._is_noise_url(normalized):
-                continue
-
-            html = self._fetch_html(normalized)
-            if not html:
-                continue
-
-            title, content = self._extract_text(normalized, html)
-            if len(content) >= min_chars and self._is_gastric_related(title, content):
-                results.append(
-                    CrawlResult(url=normalized, title=title, content=content)
-                )
+        saved = 0
+        # Checkpoint seeds in the normalized form record_page removes them by.
+        normalized_seeds = [url for url in map(self._normalize_url, seeds) if url]
+        pending: list[tuple[str, int]] = [(seed, 0) for seed in normalized_seeds]
+        if checkpoint is not None:
+            if checkpoint.is_empty():
+                checkpoint.add_frontier(normalized_seeds, depth=0)
+            else:
+                pending = checkpoint.load_frontier()
+                visited = checkpoint.load_visited()
+                saved = checkpoint.count_docs()
+                frontier.mark_seen(visited)
+                if near_duplicates is not None:
+                    for stored in checkpoint.iter_docs():
+                        near_duplicates.add(stored.url, stored.content)
+        for url, depth in pending:
+            self._enqueue(frontier, url, depth, domain_allowlist)
+        in_flight: dict[Future, tuple[str, str, int]] = {}
+
+        def ready(domain: str) -> bool:
+            return limiter.wait_time(domain) == 0
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while (frontier or in_flight) and saved < max_pages:
+                    while len(in_flight) < concurrency:
+                        item = frontier.pop(ready)
+                        if item is None:
+                            break
+                        url, depth = item
+                        domain = urlparse(url).netloc
+                        visited.add(url)
+                        limiter.acquire(domain)
+                        in_flight[pool.submit(self._fetch_page, url)] = (url, domain, depth)
+
+                    # With free slots left, every queued domain is waiting on its limiter.
+                    timeout = None
+                    if frontier and len(in_flight) < concurrency:
+                        waits = [limiter.wait_time(domain) for domain in frontier.domains()]
+                        timeout = min(waits, default=1.0)
+                    if not in_flight:
+                        if timeout is not None:
+                            time.sleep(timeout)
+                        continue
+
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        normalized, domain, depth = in_flight.pop(future)
+                        limiter.release(domain)
+                        if saved >= max_pages:
+                            continue
+                        page = future.result()
+                        if page is None:
+                            if checkpoint is not None:
+                                checkpoint.record_page(normalized)
+                            continue
+
+                        title, content, links, changed = page
+                        doc = None
+                        if (
+                            len(content) >= min_chars
+                            and self._is_gastric_related(title, content)
+                            and (
+                                near_duplicates is None
+                                or near_duplicates.add(normalized, content) is None
+                            )
+                        ):
+                            doc = CrawlResult(
+                                url=normalized, title=title, content=content, changed=changed
+                            )
+                            saved += 1
+
+                        new_links: list[str] = []
+                        for link in links:
+                            normalized_link = self._normalize_url(link)
+                            if (
+                                normalized_link
+                                and self._is_likely_gastric_link(normalized_link)
+                                and self._enqueue(
+                                    frontier, normalized_link, depth + 1, domain_allowlist
+                                )
+                            ):
+                                new_links.append(normalized_link)
+                        if checkpoint is not None:
+                            checkpoint.record_page(normalized, doc, new_links, depth + 1)
+
+                        if on_progress:
+                            on_progress(
+                                saved,
+                                max_pages,
+                                len(visited),
+                                len(frontier),
+                                normalized,
+                                frontier.duplicates_dropped,
+                            )
+                        if doc is not None:
+                            yield doc
+            finally:
+                # Also runs when the consumer stops iterating early.
+                for future in in_flight:
+                    future.cancel()
+                frontier.close()
+
+    def _enqueue(
+        self, frontier: UrlFrontier, url: str, depth: int, domain_allowlist: set[str]
+    ) -> bool:
+        normalized = self._normalize_url(url)
+        if (
+            not normalized
+            or not self._domain_allowed(normalized, domain_allowlist)
+            or self._is_noise_url(normalized)
+        ):
+            return False
+        priority = len(_TOPIC_URL_MATCHER.found(normalized)) - _DEPTH_PENALTY * depth
+        return frontier.push(normalized, urlparse(normalized).netloc, priority, depth)
+
+    def _fetch_page(self, url: str) -> tuple[str, str, list[str], bool] | None:
+        """Fetch and extract ``url``; the last item says whether it changed since the cached copy."""
+        cached = self.cache.get(url) if self.cache is not None else None
+        response = self._fetch_response(url, conditional_headers(cached))
+        if response is None:
+            return None
 
-            for link in self._extract_links(normalized, html):
-                normalized_link = self._normalize_url(link)
-                if (
-                    normalized_link
-                    and normalized_link not in visited
-                    and not self._is_noise_url(normalized_link)
-                    and self._is_likely_gastric_link(normalized_link)
-                ):
-                    queue.append(normalized_link)
-
-            if on_progress:
-                on_progress(
-                    len(results),
-                    max_pages,
-                    len(visited),
-                    len(queue),
-                    normalized,
+        etag = response.headers.get("ETag", "")
+        last_modified = response.headers.get("Last-Modified", "")
+        if cached is not None and self.cache is not None and response.status_code == 304:
+            self.cache.touch(url, etag or cached.etag, last_modified or cached.last_modified)
+            return cached.title, cached.content, cached.links, False
+
+        page = extract_page(url, response.text)
+        title, content, links = page.title or url, page.text, page.links
+        # Hash what gets indexed, not the HTML, which may differ on every request.
+        text_hash = content_hash(title, content)
+        changed = cached is None or text_hash != cached.content_hash
+        if self.cache is not None:
+            self.cache.put(
+                CachedPage(
+                    url=url,
+                    etag=etag,
+                    last_modified=last_modified,
+                    content_hash=text_hash,
+                    title=title,
+                    content=content,
+                    links=links,
+                    fetched_at=time.time(),
                 )
+            )
+        return title, content, links, changed
 
-            time.sleep(sleep_seconds)
+    def _size_connection_pool(self, concurrency: int) -> None:
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
-        return results
-
-    def save_jsonl(self, docs: list[CrawlResult], output_path: str) -> None:
-        path = Path(output_path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-
-        with path.open("w", encoding="utf-8") as f:
+    def save_jsonl(self, docs: Iterable[CrawlResult], output_path: str) -> None:
+        with JsonlWriter(output_path) as writer:
             for doc in docs:
-                f.write(
-                    json.dumps(
-                        {"url": doc.url, "title": doc.title, "content": doc.content},
-                        ensure_ascii=False,
-                    )
-                )
-                f.write("\n")
+                writer.write(doc.to_record())
 
-    def _fetch_html(self, url: str) -> str | None:
+    def _fetch_response(
+        self, url: str, headers: dict[str, str]
+    ) -> requests.Response | None:
         try:
-            response = self.session.get(url, timeout=20)
+            response = self.session.get(url, timeout=20, headers=headers)
             response.raise_for_status()
+            if response.status_code == 304:
+                return response
             content_type = response.headers.get("content-type", "")
             if "text/html" not in content_type:
                 return None
-            return response.text
+            return response
         except requests.RequestException:
             return None
 
-    def _extract_text(self, url: str, html: str) -> tuple[str, str]:
-        title = self._extract_title(html) or url
-        content = self._extract_plain_text(html)
-        return title, content
-
-    def _extract_links(self, base_url: str, html: str) -> list[str]:
-        parser = _LinkParser()
-        parser.feed(html)
-        found: list[str] = []
-        for raw_href in parser.links:
-            href = raw_href.strip()
-            if not href:
-                continue
-            absolute = urljoin(base_url, href)
-            if absolute.startswith("http"):
-                found.append(absolute)
-        return found
-
-    @staticmethod
-    def _extract_title(html: str) -> str:
-        match = re.search(
-            r"<title[^>]*>(.*?)</title>", html, flags=re.IGNORECASE | re.DOTALL
-        )
-        if not match:
-            return ""
-        text = re.sub(r"\s+", " ", match.group(1)).strip()
-        return unescape(text)
-
-    @staticmethod
-    def _extract_plain_text(html: str) -> str:
-        cleaned = re.sub(
-            r"<script[\s\S]*?</script>|<style[\s\S]*?</style>",
-            " ",
-            html,
-            flags=re.IGNORECASE,
-        )
-        cleaned = re.sub(r"<[^>]+>", " ", cleaned)
-        cleaned = unescape(cleaned)
-        cleaned = re.sub(r"\s+", " ", cleaned).strip()
-        return cleaned
-
     @staticmethod
     def _normalize_url(url: str) -> str | None:
         try:
@@ -197,19 +350,14 @@ class GastricCrawler:
 
     @staticmethod
     def _is_gastric_related(title: str, content: str) -> bool:
-        title_text = title.lower()
-        if any(word in title_text for word in NEGATIVE_TOPIC_KEYWORDS):
+        if _NEGATIVE_MATCHER.contains(title):
             return False
-
-        scoped = f"{title}\n{content[:1500]}".lower()
-        return any(keyword.lower() in scoped for keyword in GASTRIC_KEYWORDS)
+        return _GASTRIC_MATCHER.contains(f"{title}\n{content[:1500]}")
 
     @staticmethod
     def _is_noise_url(url: str) -> bool:
-        lowered = url.lower()
-        return any(hint in lowered for hint in NOISE_URL_HINTS)
+        return _NOISE_URL_MATCHER.contains(url)
 
     @staticmethod
     def _is_likely_gastric_link(url: str) -> bool:
-        lowered = url.lower()
-        return any(hint in lowered for hint in URL_TOPIC_HINTS)
+        return _TOPIC_URL_MATCHER.contains(url)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import weakref
+from concurrent.futures import Future
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from threading import Thread
+from typing import Any, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+DENSE_MATRIX_FILE = "dense.npy"
+DENSE_META_FILE = "dense.json"
+EXPORT_PAGE = 5000
+
+
+def export_dense_index(collection: Any, directory: str) -> int:
+    """Write a Chroma collection's vectors and chunks as ``dense.npy`` + ``dense.json``.
+
+    Rows are float32 copies of the stored vectors, streamed into the ``.npy``
+    page by page, so the export never holds the whole matrix in memory.
+    Returns the number of rows written.
+    """
+    path = Path(directory)
+    matrix_path = path / DENSE_MATRIX_FILE
+    tmp_path = path / "dense.tmp.npy"
+    total = collection.count()
+    ids: list[str] = []
+    documents: list[str] = []
+    metadatas: list[dict[str, Any]] = []
+    matrix: np.memmap | None = None
+    while len(ids) < total:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=EXPORT_PAGE,
+            offset=len(ids),
+        )
+        if not page["ids"]:
+            break
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        rows = matrix
+        if rows is None:
+            rows = matrix = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=np.float32, shape=(total, vectors.shape[1])
+            )
+        rows[len(ids) : len(ids) + len(vectors)] = vectors
+        ids.extend(page["ids"])
+        documents.extend(page["documents"] or [])
+        metadatas.extend(metadata or {} for metadata in page["metadatas"] or [])
+
+    if matrix is None:
+        np.save(tmp_path, np.zeros((0, 0), dtype=np.float32))
+    else:
+        matrix.flush()
+        del matrix
+    meta_tmp_path = path / f"{DENSE_META_FILE}.tmp"
+    meta_tmp_path.write_text(
+        json.dumps(
+            {"ids": ids, "documents": documents, "metadatas": metadatas}, ensure_ascii=False
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, matrix_path)
+    os.replace(meta_tmp_path, path / DENSE_META_FILE)
+    return len(ids)
+
+
+class NumpyVectorIndex:
+    """Exact top-k search over an exported, memory-mapped vector matrix.
+
+    Squared L2 distances to all rows come from one matrix product plus the
+    row norms computed at load, and the top ``k`` are picked with
+    ``argpartition``. Like Chroma's default L2 space nothing is normalised,
+    so distances and relevance (``1 - distance / sqrt(2)``) match Chroma's
+    for any query and retrieval thresholds carry over.
+
+    :meth:`search` hands queries to a single worker thread. While it is busy
+    with one batch, queries from other threads queue up and are answered
+    together by the next product, which reads the matrix once for all of
+    them instead of once per query.
+    """
+
+    def __init__(self, directory: str, max_batch: int = 64) -> None:
+        path = Path(directory)
+        self.directory = str(path)
+        self.max_batch = max_batch
+        self.matrix = np.load(path / DENSE_MATRIX_FILE, mmap_mode="r")
+        # Reads the whole matrix once, which also warms the page cache.
+        self._row_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        meta = json.loads((path / DENSE_META_FILE).read_text(encoding="utf-8"))
+        self.ids: list[str] = meta["ids"]
+        self._documents: list[str] = meta["documents"]
+        self._metadatas: list[dict[str, Any]] = meta["metadatas"]
+        self._rows = {key: row for row, key in enumerate(self.ids)}
+        self._queue: SimpleQueue[_Query | None] = SimpleQueue()
+        # The worker only holds a weak reference, so a replaced index is freed.
+        Thread(
+            target=_serve, args=(self._queue, weakref.ref(self)), name="dense-search", daemon=True
+        ).start()
+
+    @classmethod
+    def load(cls, directory: str) -> NumpyVectorIndex | None:
+        """Open the index exported to ``directory``, or ``None`` if it has none."""
+        path = Path(directory)
+        if not (path / DENSE_MATRIX_FILE).exists() or not (path / DENSE_META_FILE).exists():
+            return None
+        return cls(directory)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query_vector: Sequence[float], k: int = 20) -> list[tuple[Document, float]]:
+        future: Future[list[tuple[Document, float]]] = Future()
+        self._queue.put((np.asarray(query_vector, dtype=np.float32), k, future))
+        return future.result()
+
+    def search_batch(
+        self, query_vectors: np.ndarray, k: int = 20
+    ) -> list[list[tuple[Document, float]]]:
+        """Top ``k`` for each row of ``query_vectors`` with a single matrix product."""
+        if not self.ids:
+            return [[] for _ in range(len(query_vectors))]
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        # |q - v|^2 = |q|^2 + |v|^2 - 2 q.v
+        distances = self._row_norms - 2 * (queries @ self.matrix.T)
+        distances += query_norms[:, None]
+        k = min(k, len(self.ids))
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for row_distances, rows in zip(distances, top):
+            rows = rows[np.argsort(row_distances[rows])]
+            results.append([self._hit(row, row_distances[row]) for row in rows])
+        return results
+
+    def score_ids(
+        self, query_vector: Sequence[float], ids: list[str]
+    ) -> list[tuple[Document, float]]:
+        """Score the given chunks against ``query_vector``; unknown IDs are skipped."""
+        rows = [self._rows[key] for key in ids if key in self._rows]
+        if not rows:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        distances = self._row_norms[rows] - 2 * (self.matrix[rows] @ query) + query @ query
+        return [self._hit(row, distance) for row, distance in zip(rows, distances)]
+
+    def _hit(self, row: int, distance: float) -> tuple[Document, float]:
+        doc = Document(
+            page_content=self._documents[row],
+            metadata=self._metadatas[row],
+            id=self.ids[row],
+        )
+        # Chroma's relevance for its (squared) L2 distance.
+        return doc, 1.0 - max(float(distance), 0.0) / math.sqrt(2)
+
+    def __del__(self) -> None:
+        self._queue.put(None)
+
+
+_Query = tuple[np.ndarray, int, Future]
+
+
+def _serve(queue: SimpleQueue[_Query | None], index_ref: weakref.ref[NumpyVectorIndex]) -> None:
+    while True:
+        item = queue.get()
+        if item is None:
+            return
+        pending = [item]
+        index = index_ref()
+        if index is None:
+            return
+        while len(pending) < index.max_batch:
+            try:
+                item = queue.get_nowait()
+            except Empty:
+                break
+            if item is None:
+                # Closed while queries were waiting: answer them, then stop.
+                queue.put(None)
+                break
+            pending.append(item)
+        try:
+            results = index.search_batch(
+                np.stack([query for query, _, _ in pending]),
+                max(k for _, k, _ in pending),
+            )
+        except Exception as exc:
+            for _, _, future in pending:
+                future.set_exception(exc)
+            continue
+        finally:
+            del index
+        for (_, k, future), hits in zip(pending, results):
+            future.set_result(hits[:k])
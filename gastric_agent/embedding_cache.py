@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+from langchain_core.embeddings import Embeddings
+
+from .config import get_config
+
+
+# The disk table is trimmed once it grows this far past max_disk_entries,
+# and expired rows are swept at most this often.
+DISK_PRUNE_SLACK = 0.1
+DISK_EXPIRY_SWEEP_SECONDS = 3600.0
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def _pack(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """LRU + TTL cache of embedding vectors with optional SQLite persistence.
+
+    Vectors are stored as float32 on disk. Entries older than ``ttl_seconds``
+    are treated as misses; ``ttl_seconds <= 0`` disables expiry.
+
+    The in-memory LRU and the SQLite table have separate locks, so lookups
+    that hit memory never wait on disk writes. The table is pruned in bulk
+    when a row counter passes the cap (plus slack) or the expiry sweep is
+    due, not on every write.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl_seconds: float = 7 * 24 * 3600,
+        db_path: str = "",
+        max_disk_entries: int = 100_000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = Lock()
+        self._db_lock = Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._disk_rows = 0
+        self._last_sweep = time.time()
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_created ON embeddings (created_at)"
+            )
+            self._conn.commit()
+            self._disk_rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        key = embedding_key(model, text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[0], now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        vector = self._load(key, now)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self._remember(key, vector[0], vector[1])
+            self.hits += 1
+            return vector[1]
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        key = embedding_key(model, text)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, vector)
+        if self._conn is None:
+            return
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                (key, model, _pack(vector), now),
+            )
+            self._disk_rows += 1
+            if (
+                self._disk_rows > self.max_disk_entries * (1 + DISK_PRUNE_SLACK)
+                or now - self._last_sweep > DISK_EXPIRY_SWEEP_SECONDS
+            ):
+                self._prune_disk(now)
+            self._conn.commit()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "persistent": self._conn is not None,
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, vector: list[float]) -> None:
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str, now: float) -> tuple[float, list[float]] | None:
+        if self._conn is None:
+            return None
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        # Expired rows are left for the periodic sweep.
+        if row is None or self._expired(row[1], now):
+            return None
+        return row[1], _unpack(row[0])
+
+    def _prune_disk(self, now: float) -> None:
+        assert self._conn is not None
+        self._last_sweep = now
+        if self.ttl_seconds > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_disk_entries,),
+        )
+        self._disk_rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class ChunkEmbeddingStore:
+    """Content-addressed float32 vectors of indexed chunks, kept in SQLite.
+
+    Keys are :func:`embedding_key` of the model and chunk text, so a chunk
+    that is unchanged between index builds is never sent to the embeddings
+    API again, and switching models simply misses. Entries never expire.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._lock = Lock()
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        keys = [embedding_key(model, text) for text in texts]
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM chunk_embeddings WHERE key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        found = {key: blob for key, blob in rows}
+        return [_unpack(found[key]) if key in found else None for key in keys]
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings VALUES (?, ?)",
+                [
+                    (embedding_key(model, text), _pack(vector))
+                    for text, vector in zip(texts, vectors)
+                ],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wrap an ``Embeddings`` so repeated ``embed_query`` calls skip the remote API."""
+
+    def __init__(self, inner: Embeddings, model: str, cache: EmbeddingCache) -> None:
+        self.inner = inner
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = self.cache.get(self.model, text)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.put(self.model, text, vector)
+        return vector
+
+
+_query_cache: EmbeddingCache | None = None
+_query_cache_lock = Lock()
+
+
+def get_query_embedding_cache() -> EmbeddingCache:
+    """Process-wide query embedding cache configured from the environment."""
+    global _query_cache
+    if _query_cache is not None:
+        return _query_cache
+    with _query_cache_lock:
+        if _query_cache is None:
+            cfg = get_config()
+            _query_cache = EmbeddingCache(
+                max_entries=cfg.embedding_cache_size,
+                ttl_seconds=cfg.embedding_cache_ttl_seconds,
+                db_path=cfg.embedding_cache_path,
+            )
+    return _query_cache
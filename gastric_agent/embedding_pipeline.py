@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Iterable, Iterator
+
+import openai
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .embedding_cache import ChunkEmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# 429s, dropped connections and 5xx are worth retrying; 400/401 are not.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` acquisitions per second.
+
+    Up to ``capacity`` tokens accumulate while idle, so short bursts go out
+    immediately and the long-run rate never exceeds ``rate``.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+@dataclass
+class EmbedProgress:
+    done: int
+    total: int
+    elapsed: float
+    retries: int
+    cached: int = 0
+
+    @property
+    def rate(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> float | None:
+        if not self.total or not self.rate:
+            return None
+        return max(self.total - self.done, 0) / self.rate
+
+
+ProgressCallback = Callable[[EmbedProgress], None]
+
+
+class EmbeddingPipeline:
+    """Embed batches of chunks with several requests in flight at once.
+
+    Each batch is one request to the embeddings API. At most
+    ``max_in_flight`` requests run concurrently, new requests are started at
+    no more than ``requests_per_second`` (0 means unlimited), and rate-limit
+    or transient errors are retried with exponential backoff and jitter,
+    honouring ``Retry-After`` when the server sends it. Batches are yielded
+    as they complete, not in input order, so the caller can store them while
+    later batches are still being embedded.
+
+    With a ``store``, vectors of chunks embedded before under ``model`` are
+    loaded from it and only the remaining texts are sent; a batch found
+    entirely in the store is yielded without a request. New vectors are
+    added to the store as they arrive.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_in_flight: int = 4,
+        requests_per_second: float = 0.0,
+        max_retries: int = MAX_RETRIES,
+        store: ChunkEmbeddingStore | None = None,
+        model: str = "",
+    ) -> None:
+        self.embeddings = embeddings
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_retries = max_retries
+        self.store = store
+        self.model = model
+        self.retries = 0
+        self.cached = 0
+        self.embedded = 0
+        self._bucket = TokenBucket(requests_per_second) if requests_per_second > 0 else None
+        self._retries_lock = Lock()
+
+    def run(
+        self,
+        batches: Iterable[list[Document]],
+        total: int = 0,
+        on_progress: ProgressCallback | None = None,
+    ) -> Iterator[tuple[list[Document], list[list[float]]]]:
+        """Yield ``(batch, vectors)`` pairs; ``total`` chunks is only used for the ETA."""
+        started = time.monotonic()
+        done = 0
+        pending_batches = iter(batches)
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="embed"
+        )
+        in_flight: dict[
+            Future[list[list[float]]], tuple[list[Document], list[list[float] | None], list[int]]
+        ] = {}
+
+        def report() -> None:
+            if on_progress is not None:
+                on_progress(
+                    EmbedProgress(
+                        done=done,
+                        total=total,
+                        elapsed=time.monotonic() - started,
+                        retries=self.retries,
+                        cached=self.cached,
+                    )
+                )
+
+        try:
+            exhausted = False
+            while True:
+                # Batches are pulled lazily, so only max_in_flight are held at once.
+                while not exhausted and len(in_flight) < self.max_in_flight:
+                    batch = next(pending_batches, None)
+                    if batch is None:
+                        exhausted = True
+                        continue
+                    if not batch:
+                        continue
+                    vectors = self._lookup(batch)
+                    missing = [i for i, vector in enumerate(vectors) if vector is None]
+                    self.cached += len(batch) - len(missing)
+                    if not missing:
+                        done += len(batch)
+                        yield batch, _filled(vectors)
+                        report()
+                        continue
+                    texts = [batch[i].page_content for i in missing]
+                    in_flight[executor.submit(self._embed, texts)] = (batch, vectors, missing)
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch, vectors, missing = in_flight.pop(future)
+                    fresh = future.result()
+                    for i, vector in zip(missing, fresh):
+                        vectors[i] = vector
+                    if self.store is not None:
+                        self.store.put_many(
+                            self.model, [batch[i].page_content for i in missing], fresh
+                        )
+                    self.embedded += len(missing)
+                    done += len(batch)
+                    yield batch, _filled(vectors)
+                    report()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _lookup(self, batch: list[Document]) -> list[list[float] | None]:
+        if self.store is None:
+            return [None] * len(batch)
+        return self.store.get_many(self.model, [doc.page_content for doc in batch])
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            if self._bucket is not None:
+                self._bucket.acquire()
+            try:
+                return self.embeddings.embed_documents(texts)
+            except RETRYABLE_ERRORS as exc:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                with self._retries_lock:
+                    self.retries += 1
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS)
+                    delay *= random.uniform(0.5, 1.0)
+                logger.warning(
+                    "Embedding request failed (%s), retry %d in %.1fs",
+                    type(exc).__name__,
+                    attempt,
+                    delay,
+                )
+                time.sleep(delay)
+
+
+def _filled(vectors: list[list[float] | None]) -> list[list[float]]:
+    filled = [vector for vector in vectors if vector is not None]
+    if len(filled) != len(vectors):
+        raise ValueError("Embedding response returned fewer vectors than texts")
+    return filled
+
+
+def _retry_after(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return min(float(response.headers.get("retry-after", "")), BACKOFF_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return None
+
+
+def batched(docs: Iterable[Document], size: int) -> Iterator[list[Document]]:
+    batch: list[Document] = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import sqlite3
+from typing import Callable, Iterable
+
+
+class UrlFrontier:
+    """Priority queue of URLs to crawl with de-duplication and a memory cap.
+
+    Every URL is accepted once: pushing a URL that was queued or visited
+    before only bumps ``duplicates_dropped``. URLs are kept in one heap per
+    domain ordered by priority (higher first); :meth:`pop` takes the best
+    head among ready domains after subtracting ``fairness_penalty`` for each
+    page already taken from that domain, so one large site cannot starve the
+    others.
+
+    At most ``max_in_memory`` entries are held in the heaps. Beyond that the
+    lower-priority half is spilled to SQLite (``spill_path``, or a temporary
+    file when empty) and read back, best first, when the heaps run low or
+    the best spilled URL outranks everything in memory. The set of URLs
+    already seen obeys the same cap: past ``max_in_memory`` it is flushed to
+    an indexed table in the same database and checked there on later pushes.
+    """
+
+    def __init__(
+        self,
+        max_in_memory: int = 50_000,
+        spill_path: str = "",
+        fairness_penalty: float = 0.05,
+    ) -> None:
+        self.max_in_memory = max(max_in_memory, 2)
+        self.spill_path = spill_path
+        self.fairness_penalty = fairness_penalty
+        self.duplicates_dropped = 0
+        self.spilled = 0
+        self._heaps: dict[str, list[tuple[float, int, str, int]]] = {}
+        self._taken: dict[str, int] = {}
+        self._seen: set[str] = set()
+        self._seen_on_disk = False
+        self._in_memory = 0
+        self._on_disk = 0
+        self._disk_best = float("-inf")
+        self._seq = itertools.count()
+        self._conn: sqlite3.Connection | None = None
+
+    def __len__(self) -> int:
+        return self._in_memory + self._on_disk
+
+    def mark_seen(self, urls: Iterable[str]) -> None:
+        """Treat ``urls`` (e.g. already visited pages) as duplicates from now on."""
+        self._seen.update(urls)
+        if len(self._seen) > self.max_in_memory:
+            self._flush_seen()
+
+    def push(self, url: str, domain: str, priority: float, depth: int) -> bool:
+        if self._was_seen(url):
+            self.duplicates_dropped += 1
+            return False
+        self._seen.add(url)
+        if len(self._seen) > self.max_in_memory:
+            self._flush_seen()
+        heapq.heappush(
+            self._heaps.setdefault(domain, []), (-priority, next(self._seq), url, depth)
+        )
+        self._in_memory += 1
+        if self._in_memory > self.max_in_memory:
+            self._spill()
+        return True
+
+    def domains(self) -> list[str]:
+        """Domains with URLs waiting in memory."""
+        return [domain for domain, heap in self._heaps.items() if heap]
+
+    def pop(self, ready: Callable[[str], bool]) -> tuple[str, int] | None:
+        """Take the best ``(url, depth)`` from a domain for which ``ready`` is true."""
+        if self._on_disk and (
+            self._in_memory * 4 < self.max_in_memory or self._disk_best > self._memory_best()
+        ):
+            self._refill()
+        best_domain = ""
+        best_score = float("-inf")
+        for domain, heap in self._heaps.items():
+            if not heap:
+                continue
+            score = -heap[0][0] - self.fairness_penalty * self._taken.get(domain, 0)
+            if score > best_score and ready(domain):
+                best_domain, best_score = domain, score
+        if not best_domain:
+            return None
+        _, _, url, depth = heapq.heappop(self._heaps[best_domain])
+        self._in_memory -= 1
+        self._taken[best_domain] = self._taken.get(best_domain, 0) + 1
+        return url, depth
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _was_seen(self, url: str) -> bool:
+        if url in self._seen:
+            return True
+        if not self._seen_on_disk:
+            return False
+        row = self._spill_conn().execute("SELECT 1 FROM seen WHERE url = ?", (url,)).fetchone()
+        return row is not None
+
+    def _flush_seen(self) -> None:
+        conn = self._spill_conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen (url) VALUES (?)", [(url,) for url in self._seen]
+            )
+        self._seen.clear()
+        self._seen_on_disk = True
+
+    def _memory_best(self) -> float:
+        return max((-heap[0][0] for heap in self._heaps.values() if heap), default=float("-inf"))
+
+    def _spill(self) -> None:
+        entries = [
+            (domain, entry) for domain, heap in self._heaps.items() for entry in heap
+        ]
+        # Keep the better half in memory; entries sort best first by -priority.
+        entries.sort(key=lambda item: item[1])
+        keep = self.max_in_memory // 2
+        spill = entries[keep:]
+        self._heaps = {}
+        for domain, entry in entries[:keep]:
+            self._heaps.setdefault(domain, []).append(entry)
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+        conn = self._spill_conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO spilled (url, domain, priority, depth) VALUES (?, ?, ?, ?)",
+                [
+                    (url, domain, -neg_priority, depth)
+                    for domain, (neg_priority, _, url, depth) in spill
+                ],
+            )
+        self._in_memory = keep
+        self._on_disk += len(spill)
+        self.spilled += len(spill)
+        if spill:
+            self._disk_best = max(self._disk_best, -spill[0][1][0])
+
+    def _refill(self) -> None:
+        # Make room for half the cap, so memory ends up holding the overall best.
+        if self._in_memory > self.max_in_memory // 2:
+            self._spill()
+        conn = self._spill_conn()
+        rows = conn.execute(
+            "SELECT id, url, domain, priority, depth FROM spilled ORDER BY priority DESC, id LIMIT ?",
+            (self.max_in_memory - self._in_memory,),
+        ).fetchall()
+        with conn:
+            conn.executemany("DELETE FROM spilled WHERE id = ?", [(row[0],) for row in rows])
+        best = conn.execute("SELECT MAX(priority) FROM spilled").fetchone()[0]
+        self._disk_best = best if best is not None else float("-inf")
+        for _, url, domain, priority, depth in rows:
+            heapq.heappush(
+                self._heaps.setdefault(domain, []), (-priority, next(self._seq), url, depth)
+            )
+        self._in_memory += len(rows)
+        self._on_disk -= len(rows)
+
+    def _spill_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # An empty path gives SQLite's private temporary on-disk database.
+            self._conn = sqlite3.connect(self.spill_path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spilled (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    priority REAL NOT NULL,
+                    depth INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_spilled_priority ON spilled (priority DESC, id)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY)")
+            # Rows from an earlier run belong to a different frontier.
+            self._conn.execute("DELETE FROM spilled")
+            self._conn.execute("DELETE FROM seen")
+            self._conn.commit()
+        return self._conn
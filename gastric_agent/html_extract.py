@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from urllib.parse import urljoin
+
+from lxml import etree
+from lxml import html as lxml_html
+
+# Never part of the readable text. Only search boxes and small forms are
+# dropped: ASP.NET WebForms and some CMSs wrap the whole body in one <form>.
+_DROP_XPATH = (
+    "//script | //style | //noscript | //template | //svg | //iframe"
+    " | //form[@role='search' or .//input[@type='search']"
+    " or (not(.//p) and string-length(normalize-space()) < 200)]"
+    " | //button | //select | //nav | //aside | //footer"
+    " | //header[not(ancestor::article) and not(ancestor::main)]"
+    " | //comment() | //processing-instruction()"
+)
+_CANDIDATE_XPATH = "//article | //main"
+# A content container must hold this share of the body text to replace it,
+# so one teaser <article> on a listing page does not win.
+_MAIN_CONTENT_SHARE = 0.4
+
+_BLOCK_TAGS = frozenset(
+    {
+        "address", "article", "blockquote", "br", "dd", "div", "dl", "dt",
+        "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li",
+        "main", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+    }
+)
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+_INLINE_SPACE = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\s*\n\s*")
+
+
+@dataclass
+class ExtractedPage:
+    title: str
+    text: str
+    links: list[str]
+
+
+def extract_page(base_url: str, html: str) -> ExtractedPage:
+    """Parse ``html`` once and return its title, main text and absolute links.
+
+    Scripts, styles, navigation, sidebars and footers are removed before the
+    text is read. When an ``<article>``/``<main>`` holds most of the text it
+    is used instead of the whole body. Block elements become line breaks so
+    the splitter can cut on paragraph boundaries.
+    """
+    root = _parse(html)
+    if root is None:
+        return ExtractedPage(title="", text="", links=[])
+
+    title = _INLINE_SPACE.sub(" ", root.findtext(".//title") or "").strip()
+    links: list[str] = []
+    for raw_href in root.xpath("//a/@href"):
+        href = raw_href.strip()
+        if not href:
+            continue
+        absolute = urljoin(base_url, href)
+        if absolute.startswith("http"):
+            links.append(absolute)
+
+    for element in root.xpath(_DROP_XPATH):
+        element.drop_tree()
+
+    body = root.find("body")
+    container = body if body is not None else root
+    body_chars = len(container.text_content())
+    best_chars = 0
+    for candidate in root.xpath(_CANDIDATE_XPATH):
+        chars = len(candidate.text_content())
+        if chars > best_chars and chars >= body_chars * _MAIN_CONTENT_SHARE:
+            container, best_chars = candidate, chars
+
+    return ExtractedPage(title=title, text=_block_text(container), links=links)
+
+
+def _parse(html: str) -> lxml_html.HtmlElement | None:
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        # lxml rejects str input that still carries an encoding declaration.
+        try:
+            return lxml_html.document_fromstring(_XML_DECLARATION.sub("", html, count=1))
+        except (ValueError, etree.ParserError):
+            return None
+    except etree.ParserError:
+        return None
+
+
+def _block_text(container: etree._Element) -> str:
+    parts: list[str] = []
+    for event, element in etree.iterwalk(container, events=("start", "end")):
+        block = element.tag in _BLOCK_TAGS
+        if event == "start":
+            if block:
+                parts.append("\n")
+            if element.text:
+                parts.append(element.text)
+        else:
+            if block:
+                parts.append("\n")
+            if element.tail and element is not container:
+                parts.append(element.tail)
+    text = _INLINE_SPACE.sub(" ", "".join(parts))
+    return _BLANK_LINES.sub("\n", text).strip()
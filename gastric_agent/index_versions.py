@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+MANIFEST_FILE = "CURRENT.json"
+VERSIONS_DIR = "versions"
+
+
+class IndexVersions:
+    """Blue/green versions of the vector index under one root directory.
+
+    Each build goes into its own ``versions/<timestamp>-<id>`` directory and
+    only becomes live when :meth:`activate` atomically replaces the
+    ``CURRENT.json`` manifest that points at it, so readers never see a
+    half-written index. A root without a manifest is a legacy single-index
+    directory and resolves to itself.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self.manifest_path = self.root / MANIFEST_FILE
+        self.versions_path = self.root / VERSIONS_DIR
+
+    def manifest(self) -> dict[str, Any]:
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def current_version(self) -> str:
+        return self.manifest().get("version", "")
+
+    def current_dir(self) -> Path:
+        version = self.current_version()
+        return self.versions_path / version if version else self.root
+
+    def create(self, copy_current: bool = False) -> Path:
+        """Make a fresh version directory, optionally seeded with the live index."""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        target = self.versions_path / f"{stamp}-{uuid.uuid4().hex[:8]}"
+        source = self.current_dir()
+        if copy_current and (source / "chroma.sqlite3").exists():
+            # The server only reads the live index, so copying it is safe.
+            shutil.copytree(
+                source,
+                target,
+                ignore=shutil.ignore_patterns(MANIFEST_FILE, VERSIONS_DIR),
+            )
+        else:
+            target.mkdir(parents=True)
+        return target
+
+    def activate(self, version_dir: Path, **info: Any) -> None:
+        """Point ``CURRENT.json`` at ``version_dir`` with an atomic rename."""
+        manifest = {
+            "version": version_dir.name,
+            "activated_at": datetime.now(timezone.utc).isoformat(),
+            "previous": self.current_version(),
+            **info,
+        }
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def discard(self, version_dir: Path) -> None:
+        shutil.rmtree(version_dir, ignore_errors=True)
+
+    def collect_garbage(self, keep: int) -> list[str]:
+        """Delete all but the ``keep`` newest versions.
+
+        The live version and the one it replaced are always kept, so a server
+        that has not reloaded yet still finds its index.
+        """
+        if not self.versions_path.exists():
+            return []
+        manifest = self.manifest()
+        protected = {manifest.get("version", ""), manifest.get("previous", "")}
+        versions = sorted(
+            (path for path in self.versions_path.iterdir() if path.is_dir()),
+            key=lambda path: path.name,
+            reverse=True,
+        )
+        removed = []
+        for path in versions[max(keep, 1) :]:
+            if path.name in protected:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path.name)
+        return removed
+
+
+def resolve_index_dir(root: str) -> str:
+    """Directory holding the live index under ``root`` (``root`` itself if unversioned)."""
+    return str(IndexVersions(root).current_dir())
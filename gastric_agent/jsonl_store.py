@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+import zstandard
+
+ZSTD_SUFFIX = ".zst"
+
+
+def is_compressed(path: str | Path) -> bool:
+    return str(path).endswith(ZSTD_SUFFIX)
+
+
+def sibling_path(output_path: str, suffix: str) -> str:
+    """Path next to a JSONL output sharing its stem (``x.jsonl.zst`` -> ``x.<suffix>``)."""
+    path = Path(output_path)
+    name = path.name.removesuffix(ZSTD_SUFFIX).removesuffix(".jsonl")
+    return str(path.with_name(f"{name}.{suffix}"))
+
+
+class JsonlWriter:
+    """Write one JSON record per line, flushing each record to disk.
+
+    Paths ending in ``.zst`` are zstd-compressed, one frame per record, so
+    the file stays readable after an interruption and can be appended to by
+    a later run. ``append=False`` truncates any existing file.
+    """
+
+    def __init__(self, path: str, append: bool = False, level: int = 3) -> None:
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(target)
+        self.count = 0
+        self._raw: IO[bytes] = target.open("ab" if append else "wb")
+        self._compressor = zstandard.ZstdCompressor(level=level) if is_compressed(path) else None
+
+    def write(self, record: dict[str, Any]) -> None:
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._raw.write(data)
+        self._raw.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._raw.close()
+
+    def __enter__(self) -> JsonlWriter:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def count_lines(path: str) -> int:
+    """Count the lines of a ``.jsonl`` or ``.jsonl.zst`` file without parsing them."""
+    with Path(path).open("rb") as raw:
+        stream: IO[bytes] = raw
+        if is_compressed(path):
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        return sum(block.count(b"\n") for block in iter(lambda: stream.read(1 << 20), b""))
+
+
+def iter_jsonl(path: str) -> Iterator[dict[str, Any]]:
+    """Yield records from a ``.jsonl`` or ``.jsonl.zst`` file without loading it whole."""
+    with Path(path).open("rb") as raw:
+        stream: IO[bytes] = raw
+        if is_compressed(path):
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        for line in io.TextIOWrapper(stream, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
@@ -1,34 +1,87 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from itertools import chain
 from pathlib import Path
+from typing import Any, Iterable, Iterator
 
+import numpy as np
+from chromadb.api.types import GetResult, Include
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 
 from .config import get_config
+from .dense_index import export_dense_index
+from .embedding_cache import ChunkEmbeddingStore
+from .embedding_pipeline import EmbeddingPipeline, EmbedProgress, ProgressCallback, batched
+from .index_versions import IndexVersions, resolve_index_dir
+from .jsonl_store import count_lines, iter_jsonl
+from .near_dup import NearDuplicateIndex
+from .sparse_index import BM25Index
+
+KB_VERSION_FILE = "kb_version.json"
+CHUNK_LIST_PAGE = 5000
+
+
+@dataclass
+class IndexStats:
+    """Outcome of an index build; a full build counts every page as added."""
+
+    chunks: int = 0
+    embedded: int = 0
+    cached: int = 0
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    chunks_deleted: int = 0
+    version: str = ""
+    versions_removed: list[str] = field(default_factory=list)
+
+    @property
+    def cache_hit_rate(self) -> float:
+        total = self.embedded + self.cached
+        return self.cached / total if total else 0.0
+
+
+def chunk_id(source: str, offset: int, text: str) -> str:
+    """Deterministic chunk ID: the same text at the same place in a page keeps its ID."""
+    return f"{_digest(source)}-{offset}-{_digest(text)}"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
 
 
 def load_raw_docs(jsonl_path: str) -> list[Document]:
+    return list(iter_raw_docs(jsonl_path))
+
+
+def iter_raw_docs(jsonl_path: str) -> Iterator[Document]:
+    """Yield one ``Document`` per non-empty record, reading the file lazily."""
     path = Path(jsonl_path)
     if not path.exists():
         raise FileNotFoundError(f"Raw document file not found: {jsonl_path}")
+    return _records_to_docs(iter_jsonl(jsonl_path))
+
 
-    docs: list[Document] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            record = json.loads(line)
-            content = (record.get("content") or "").strip()
-            if not content:
-                continue
-            metadata = {
-                "source": record.get("url", ""),
-                "title": record.get("title", ""),
-            }
-            docs.append(Document(page_content=content, metadata=metadata))
-    return docs
+def _records_to_docs(records: Iterable[dict[str, Any]]) -> Iterator[Document]:
+    for record in records:
+        content = (record.get("content") or "").strip()
+        if not content:
+            continue
+        metadata = {
+            "source": record.get("url", ""),
+            "title": record.get("title", ""),
+        }
+        yield Document(page_content=content, metadata=metadata)
 
 
 def build_vector_db(
@@ -36,11 +89,52 @@ def build_vector_db(
     persist_dir: str,
     chunk_size: int = 700,
     chunk_overlap: int = 64,
-) -> int:
+    changed_urls: set[str] | None = None,
+    near_duplicates: NearDuplicateIndex | None = None,
+    on_progress: ProgressCallback | None = None,
+    incremental: bool = False,
+) -> IndexStats:
+    """Embed the crawled docs into a new Chroma index version and report what was written.
+
+    ``persist_dir`` is the root of the versioned index (see
+    :class:`IndexVersions`). A full build starts from an empty version; an
+    incremental one from a copy of the live version. The new version is
+    activated only once it is complete, so readers never see a partial
+    index, a failed build leaves the live version untouched, and versions
+    beyond ``INDEX_KEEP_VERSIONS`` are removed afterwards.
+
+    Every chunk gets a :func:`chunk_id`. With ``incremental`` the chunk IDs
+    of each page are compared with those already indexed: only chunks with
+    new IDs are embedded and upserted, chunks that no longer exist
+    (including every chunk of pages missing from the crawl) are deleted, and
+    unchanged pages are left alone. ``changed_urls`` implies ``incremental``
+    and additionally skips re-chunking indexed pages that are not listed in
+    it.
+
+    With ``near_duplicates`` every doc is checked against the ones before it
+    and near-duplicates are left out of the index.
+
+    Chunks are embedded by an :class:`EmbeddingPipeline` sized from the
+    ``INDEX_EMBED_*`` settings and written to Chroma batch by batch as the
+    requests complete; ``on_progress`` is called after each batch. Vectors
+    are looked up in the chunk embedding store first, so only chunks whose
+    text is new for the model are sent to DashScope. A BM25 index of the
+    final collection is saved next to it for hybrid retrieval, and so is an
+    export of its vectors for the ``numpy`` retrieval backend.
+
+    The raw file is streamed: docs are read, split and embedded lazily, so
+    memory stays bounded by the batches in flight whatever the corpus size,
+    and an interrupted build loses only those batches: re-running it loads
+    every vector embedded so far from the embedding store.
+    """
     config = get_config()
-    raw_docs = load_raw_docs(jsonl_path)
-    if not raw_docs:
+    incremental = incremental or changed_urls is not None
+    raw_docs = iter_raw_docs(jsonl_path)
+    first_doc = next(raw_docs, None)
+    if first_doc is None:
         raise ValueError("No valid documents found in raw data file.")
+    # Only used to estimate the ETA; counting lines is far cheaper than parsing.
+    total_docs = count_lines(jsonl_path)
 
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
@@ -62,25 +156,203 @@ def build_vector_db(
         ],
         length_function=len,
     )
-    chunks = splitter.split_documents(raw_docs)
-    if not chunks:
-        raise ValueError("Text splitter produced no chunks.")
 
     embeddings = OpenAIEmbeddings(
         model=config.dashscope_embedding_model,
         api_key=config.dashscope_api_key,
         base_url=config.dashscope_base_url,
         check_embedding_ctx_length=False,
-        chunk_size=10,
+        chunk_size=config.index_embed_batch_size,
+        # Retries are handled by the pipeline, which backs off across threads.
+        max_retries=0,
     )
+    versions = IndexVersions(persist_dir)
+    index_dir = versions.create(copy_current=incremental)
+    try:
+        vectordb = Chroma(
+            persist_directory=str(index_dir),
+            embedding_function=embeddings,
+            collection_name="gastric_knowledge",
+        )
+        indexed = _indexed_chunk_ids(vectordb) if incremental else {}
 
-    persist_path = Path(persist_dir)
-    persist_path.mkdir(parents=True, exist_ok=True)
+        stats = IndexStats()
+        stale_ids: list[str] = []
+        docs_read = 0
+        chunks_planned = 0
 
-    vectordb = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=str(persist_path),
-        collection_name="gastric_knowledge",
-    )
-    return len(chunks)
+        def chunks_to_write() -> Iterator[Document]:
+            nonlocal docs_read, chunks_planned
+            for doc in chain([first_doc], raw_docs):
+                docs_read += 1
+                source = doc.metadata["source"]
+                # Check all docs, not just changed ones, so a changed page that
+                # now copies an unchanged one is still caught.
+                if (
+                    near_duplicates is not None
+                    and near_duplicates.add(source, doc.page_content) is not None
+                ):
+                    continue
+                old_ids = indexed.pop(source, set())
+                if changed_urls is not None and old_ids and source not in changed_urls:
+                    stats.unchanged += 1
+                    continue
+                doc_chunks = splitter.split_documents([doc])
+                new_ids: set[str] = set()
+                for offset, chunk in enumerate(doc_chunks):
+                    chunk.id = chunk_id(source, offset, chunk.page_content)
+                    new_ids.add(chunk.id)
+                if new_ids == old_ids:
+                    stats.unchanged += 1
+                    continue
+                if old_ids:
+                    stats.updated += 1
+                else:
+                    stats.added += 1
+                stale_ids.extend(old_ids - new_ids)
+                for chunk in doc_chunks:
+                    if chunk.id not in old_ids:
+                        chunks_planned += 1
+                        yield chunk
+
+        def report(progress: EmbedProgress) -> None:
+            if on_progress is None:
+                return
+            estimate = round(chunks_planned / docs_read * total_docs) if docs_read else 0
+            on_progress(replace(progress, total=max(estimate, progress.done)))
+
+        store = (
+            ChunkEmbeddingStore(config.index_embedding_store_path)
+            if config.index_embedding_store_path
+            else None
+        )
+        pipeline = EmbeddingPipeline(
+            embeddings,
+            max_in_flight=config.index_embed_concurrency,
+            requests_per_second=config.index_embed_rps,
+            store=store,
+            model=config.dashscope_embedding_model,
+        )
+        try:
+            # The pipeline pulls batches lazily, so at most max_in_flight batches
+            # are held in memory; each upsert is committed by Chroma on return.
+            for batch, vectors in pipeline.run(
+                batched(chunks_to_write(), config.index_embed_batch_size),
+                on_progress=report,
+            ):
+                ids = [doc.id for doc in batch if doc.id is not None]
+                # chunks_to_write() gives every chunk its ID.
+                assert len(ids) == len(batch)
+                vectordb._collection.upsert(
+                    ids=ids,
+                    embeddings=np.asarray(vectors, dtype=np.float32),
+                    documents=[doc.page_content for doc in batch],
+                    metadatas=[doc.metadata for doc in batch],
+                )
+                stats.chunks += len(batch)
+        finally:
+            if store is not None:
+                store.close()
+        stats.embedded = pipeline.embedded
+        stats.cached = pipeline.cached
+
+        # Pages left in ``indexed`` were not crawled this time (or are now duplicates).
+        stats.deleted = len(indexed)
+        for ids in indexed.values():
+            stale_ids.extend(ids)
+        if not incremental and not stats.chunks:
+            raise ValueError("Text splitter produced no chunks.")
+        if not stats.chunks and not stale_ids:
+            # Nothing changed: keep serving the live version.
+            versions.discard(index_dir)
+            return stats
+        # This version is only activated once complete, so delete order is free.
+        for start in range(0, len(stale_ids), CHUNK_LIST_PAGE):
+            vectordb._collection.delete(ids=stale_ids[start : start + CHUNK_LIST_PAGE])
+
+        stats.chunks_deleted = len(stale_ids)
+
+        # Rebuilt from the final collection, so it always matches the vectors.
+        BM25Index.build(
+            (key, text)
+            for page in _collection_pages(vectordb, ["documents"])
+            for key, text in zip(page["ids"], page["documents"] or [])
+        ).save(str(index_dir))
+        export_dense_index(vectordb._collection, str(index_dir))
+    except BaseException:
+        versions.discard(index_dir)
+        raise
+
+    chunk_count = vectordb._collection.count()
+    kb_version = write_kb_version(str(index_dir), chunk_count=chunk_count)
+    versions.activate(index_dir, kb_version=kb_version, chunks=chunk_count)
+    stats.version = index_dir.name
+    stats.versions_removed = versions.collect_garbage(config.index_keep_versions)
+    return stats
+
+
+def export_dense_version(persist_dir: str) -> tuple[str, int]:
+    """Activate a copy of the live index with a dense export added.
+
+    Returns the new version and the number of vectors exported. Writing the
+    export into the live version would go unnoticed by a running server,
+    which only reloads when ``CURRENT.json`` points at a new version.
+    """
+    config = get_config()
+    versions = IndexVersions(persist_dir)
+    if not (versions.current_dir() / "chroma.sqlite3").exists():
+        raise FileNotFoundError(f"No vector index found in {persist_dir}")
+    index_dir = versions.create(copy_current=True)
+    try:
+        vectordb = Chroma(
+            persist_directory=str(index_dir),
+            collection_name="gastric_knowledge",
+        )
+        rows = export_dense_index(vectordb._collection, str(index_dir))
+    except BaseException:
+        versions.discard(index_dir)
+        raise
+    # Same chunks as before, so cached answers stay valid.
+    versions.activate(index_dir, kb_version=read_kb_version(str(index_dir)), chunks=rows)
+    versions.collect_garbage(config.index_keep_versions)
+    return index_dir.name, rows
+
+
+def _indexed_chunk_ids(vectordb: Chroma) -> dict[str, set[str]]:
+    """Map each indexed source URL to the IDs of its chunks."""
+    ids_by_source: dict[str, set[str]] = defaultdict(set)
+    for page in _collection_pages(vectordb, ["metadatas"]):
+        for key, metadata in zip(page["ids"], page["metadatas"] or []):
+            ids_by_source[str((metadata or {}).get("source", ""))].add(key)
+    return ids_by_source
+
+
+def _collection_pages(vectordb: Chroma, include: Include) -> Iterator[GetResult]:
+    offset = 0
+    while True:
+        page = vectordb._collection.get(include=include, limit=CHUNK_LIST_PAGE, offset=offset)
+        yield page
+        if len(page["ids"]) < CHUNK_LIST_PAGE:
+            return
+        offset += CHUNK_LIST_PAGE
+
+
+def write_kb_version(persist_dir: str, chunk_count: int) -> str:
+    """Stamp the index with a fresh version so answer caches drop stale entries."""
+    version = uuid.uuid4().hex
+    stamp = {
+        "version": version,
+        "chunks": chunk_count,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    path = Path(persist_dir) / KB_VERSION_FILE
+    path.write_text(json.dumps(stamp, ensure_ascii=False), encoding="utf-8")
+    return version
+
+
+def read_kb_version(persist_dir: str) -> str:
+    path = Path(resolve_index_dir(persist_dir)) / KB_VERSION_FILE
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("version", "")
+    except (OSError, json.JSONDecodeError):
+        return ""
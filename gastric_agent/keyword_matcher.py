@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+
+@dataclass(frozen=True)
+class KeywordMatch:
+    keyword: str
+    start: int
+    end: int
+
+
+class KeywordMatcher:
+    """Case-insensitive substring search for a fixed keyword set in one regex.
+
+    The keywords are compiled once into a trie-shaped regex, so one scan of
+    the lowercased text replaces a loop of ``keyword in text`` checks and
+    the regex engine can skip ahead on the keywords' first characters.
+    ``matches`` reports the longest keyword starting at each position
+    (positions refer to ``text.lower()``); ``found`` also includes shorter
+    keywords nested inside those matches (e.g. ``胃`` inside ``胃炎``), so it
+    equals the set of keywords that occur.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords = frozenset(k.lower() for k in keywords if k)
+        pattern = _trie_pattern(self.keywords) if self.keywords else "(?!)"
+        self._any = re.compile(pattern)
+        # A zero-width lookahead lets matches overlap (``肠胃炎`` and ``胃炎``).
+        self._each = re.compile(f"(?=({pattern}))")
+        self._nested = {
+            k: frozenset(other for other in self.keywords if other in k) for k in self.keywords
+        }
+
+    def contains(self, text: str) -> bool:
+        return self._any.search(text.lower()) is not None
+
+    def matches(self, text: str) -> Iterator[KeywordMatch]:
+        for match in self._each.finditer(text.lower()):
+            keyword = match.group(1)
+            yield KeywordMatch(
+                keyword=keyword, start=match.start(), end=match.start() + len(keyword)
+            )
+
+    def found(self, text: str) -> set[str]:
+        terms: set[str] = set()
+        for match in self._each.finditer(text.lower()):
+            terms |= self._nested[match.group(1)]
+        return terms
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Build a regex whose branches share prefixes, e.g. ``gastr(?:itis|o)?``.
+
+    Optional suffixes are greedy, so the longest keyword at a position wins.
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
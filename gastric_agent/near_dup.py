@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import xxhash
+
+from .jsonl_store import sibling_path
+
+DEFAULT_THRESHOLD = 0.9
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SPACE = re.compile(r"\s+")
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH index that flags documents nearly identical to earlier ones.
+
+    Texts are lowercased, whitespace-collapsed and cut into overlapping
+    character ``shingle_size``-grams (which works for Chinese and English
+    alike). A document whose estimated Jaccard similarity with an already
+    added document reaches ``threshold`` is reported as a duplicate of it and
+    is not indexed itself, so the first copy seen is the one kept.
+    """
+
+    def __init__(
+        self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = 128, shingle_size: int = 5
+    ) -> None:
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._signatures: dict[str, np.ndarray] = {}
+        self._buckets: dict[tuple[int, bytes], list[str]] = defaultdict(list)
+        self.documents = 0
+        self.clusters: dict[str, list[tuple[str, float]]] = {}
+
+    def add(self, key: str, text: str) -> str | None:
+        """Register ``text`` under ``key``; return the kept key it duplicates, if any."""
+        self.documents += 1
+        signature = self._signature(text)
+        band_keys = [
+            (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+        best_key, best_similarity = None, 0.0
+        checked: set[str] = set()
+        for band_key in band_keys:
+            for candidate in self._buckets.get(band_key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best_key, best_similarity = candidate, similarity
+
+        if best_key is not None:
+            self.clusters.setdefault(best_key, []).append((key, round(best_similarity, 4)))
+            return best_key
+
+        self._signatures[key] = signature
+        for band_key in band_keys:
+            self._buckets[band_key].append(key)
+        return None
+
+    @property
+    def removed(self) -> int:
+        return sum(len(members) for members in self.clusters.values())
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "threshold": self.threshold,
+            "documents": self.documents,
+            "removed": self.removed,
+            "clusters": [
+                {
+                    "kept": kept,
+                    "removed": [
+                        {"key": key, "similarity": similarity} for key, similarity in members
+                    ],
+                }
+                for kept, members in self.clusters.items()
+            ],
+        }
+
+    def write_report(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(
+            json.dumps(self.report(), ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+    def _signature(self, text: str) -> np.ndarray:
+        normalized = _SPACE.sub(" ", text.lower()).strip()
+        size = self.shingle_size
+        shingles = {normalized[i : i + size] for i in range(max(len(normalized) - size + 1, 1))}
+        hashes = np.fromiter(
+            (xxhash.xxh64_intdigest(shingle) & 0xFFFFFFFF for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # Universal hashing (a*h + b) mod p, one row per permutation.
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1)
+
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Pick bands x rows so a pair at ``threshold`` becomes a candidate with >= 95% odds.
+
+    Among such splits the one with the most rows per band is used, which
+    keeps dissimilar pairs from colliding.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1 - (1 - threshold**rows) ** bands >= 0.95:
+            best = (bands, rows)
+    return best
+
+
+def report_path_for(output_path: str) -> str:
+    return sibling_path(output_path, "dedup.json")
@@ -1,16 +1,26 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from dataclasses import dataclass, field
 import re
-from typing import Any, Callable
+from typing import Any, Awaitable, Callable
 
+import numpy as np
+from chromadb.api.shared_system_client import SharedSystemClient
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from openai import OpenAI
+from openai import AsyncOpenAI, Omit, OpenAI, omit
 from openai.types.chat import ChatCompletionMessageParam
 
+from .answer_cache import AnswerCache, CachedAnswer, get_answer_cache
 from .config import get_config
+from .dense_index import NumpyVectorIndex
+from .embedding_cache import CachedQueryEmbeddings, get_query_embedding_cache
+from .kb_builder import read_kb_version
+from .keyword_matcher import KeywordMatcher
+from .sparse_index import BM25Index, reciprocal_rank_fusion
 
 
 SYSTEM_PROMPT = (
@@ -55,11 +65,19 @@ NON_TARGET_TERMS = {
     "gallbladder",
 }
 
+_GENERAL_GASTRIC_MATCHER = KeywordMatcher(GENERAL_GASTRIC_TERMS)
+_NON_TARGET_MATCHER = KeywordMatcher(NON_TARGET_TERMS)
+_TERM_MATCHER = KeywordMatcher(GENERAL_GASTRIC_TERMS | NON_TARGET_TERMS)
+
 # --- Dynamic retrieval thresholds ---
 _ABS_THRESHOLD = 0.3  # Minimum absolute relevance score (filter pure noise)
 _REL_RATIO = 0.5  # Keep docs within 50% of best score
 _MIN_RESULTS = 2  # Always return at least 2 docs
 _MAX_RESULTS = 8  # Never return more than 8 docs
+_VECTOR_TOP_K = 20
+_SPARSE_TOP_K = 20  # BM25 candidates fused with the vector hits (hybrid mode)
+
+_REPLAY_PIECE_CHARS = 16  # Chunk size when replaying cached answers as a stream
 
 
 @dataclass
@@ -74,18 +92,71 @@ class QAResponse:
 class GastricRAGAgent:
     def __init__(self, persist_dir: str) -> None:
         self.config = get_config()
-        self.embeddings = OpenAIEmbeddings(
+        self.persist_dir = persist_dir
+        self.embeddings = CachedQueryEmbeddings(
+            OpenAIEmbeddings(
+                model=self.config.dashscope_embedding_model,
+                api_key=self.config.dashscope_api_key,
+                base_url=self.config.dashscope_base_url,
+                check_embedding_ctx_length=False,
+                chunk_size=10,
+            ),
             model=self.config.dashscope_embedding_model,
-            api_key=self.config.dashscope_api_key,
-            base_url=self.config.dashscope_base_url,
-            check_embedding_ctx_length=False,
-            chunk_size=10,
+            cache=get_query_embedding_cache(),
         )
         self.vectordb = Chroma(
             collection_name="gastric_knowledge",
             embedding_function=self.embeddings,
             persist_directory=persist_dir,
         )
+        self.sparse_index = (
+            BM25Index.load(persist_dir) if self.config.retrieval_hybrid else None
+        )
+        # Indexes built before the dense export keep using Chroma.
+        self.dense_index = (
+            NumpyVectorIndex.load(persist_dir)
+            if self.config.retrieval_backend == "numpy"
+            else None
+        )
+        # Long-lived clients so pooled agents reuse their HTTP connections.
+        self._chat_llm = ChatOpenAI(
+            model=self.config.deepseek_chat_model,
+            api_key=self.config.deepseek_api_key,
+            base_url=self.config.deepseek_base_url,
+            temperature=0.1,
+        )
+        self._reasoner_llm = ChatOpenAI(
+            model=self.config.deepseek_reasoner_model,
+            api_key=self.config.deepseek_api_key,
+            base_url=self.config.deepseek_base_url,
+        )
+        self._client = OpenAI(
+            api_key=self.config.deepseek_api_key,
+            base_url=self.config.deepseek_base_url,
+        )
+        self._async_client = AsyncOpenAI(
+            api_key=self.config.deepseek_api_key,
+            base_url=self.config.deepseek_base_url,
+        )
+
+    def close(self) -> None:
+        """Release the index: stop its Chroma system and drop chromadb's cached one.
+
+        chromadb keeps one system per path for the life of the process, so
+        without this a retired index version stays open after it is replaced.
+        The agent must not be used afterwards.
+        """
+        client = self.vectordb._client
+        if isinstance(client, SharedSystemClient):
+            client._system.stop()
+            SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+
+    def warm_up(self) -> int:
+        """Load the collection and HNSW segment; return the stored chunk count."""
+        count = self.vectordb._collection.count()
+        if count:
+            self._vector_search("胃", k=1)
+        return count
 
     def answer(
         self,
@@ -101,66 +172,26 @@ class GastricRAGAgent:
             on_thought("正在理解问题意图...")
 
         normalized_question = _normalize_question(question)
-        docs_with_scores = self.vectordb.similarity_search_with_relevance_scores(
-            normalized_question, k=20
+        cache_state = self._check_answer_cache(
+            normalized_question, think_mode, memory_context
         )
-        if on_thought:
-            on_thought(f"已检索到 {len(docs_with_scores)} 条候选资料，正在筛选...")
+        if cache_state.cached is not None:
+            if on_thought:
+                on_thought("命中相似问题的已有回答。")
+            return _replay_cached_answer(cache_state.cached, on_reasoning_token, on_token)
 
-        docs = _select_relevant_docs(normalized_question, docs_with_scores)
+        candidate_count, docs = self._retrieve(normalized_question)
         if on_thought:
+            on_thought(f"已检索到 {candidate_count} 条候选资料，正在筛选...")
             on_thought(f"已筛选出 {len(docs)} 条高相关资料（动态阈值）。")
 
         if not docs:
-            return QAResponse(
-                answer="根据当前知识库资料，我无法确定，请咨询医生或补充更多信息。",
-                sources=[],
-                references=[],
-                retrieved_items=[],
-                thinking_trace="",
-            )
-
-        context_lines: list[str] = []
-        retrieved_items: list[dict[str, str]] = []
-        for i, doc in enumerate(docs, start=1):
-            source = doc.metadata.get("source", "")
-            title = doc.metadata.get("title", "")
-            snippet = doc.page_content[:200].replace("\n", " ").strip()
-            retrieved_items.append(
-                {
-                    "idx": str(i),
-                    "title": title or "(untitled)",
-                    "source": source,
-                    "snippet": snippet,
-                }
-            )
-            context_lines.append(
-                f"[资料{i}] 标题: {title}\n来源: {source}\n内容: {doc.page_content[:1200]}"
-            )
+            return _no_answer_response()
 
+        context_lines, retrieved_items = _build_context(docs)
+        messages = _build_messages(question, context_lines, memory_context)
         llm = self._build_llm(think_mode=think_mode)
 
-        user_prompt = (
-            f"用户问题: {question}\n\n"
-            "以下是检索到的上下文：\n"
-            + "\n\n".join(context_lines)
-            + "\n\n请直接给出回答，不要在正文中使用任何编号引用（如[1]、[2]），也不要输出URL。"
-        )
-
-        system_content = SYSTEM_PROMPT
-        if memory_context:
-            system_content = (
-                SYSTEM_PROMPT
-                + "\n\n"
-                + memory_context
-                + "\n请根据用户个人健康档案给出量身定制的建议。"
-            )
-
-        messages = [
-            SystemMessage(content=system_content),
-            HumanMessage(content=user_prompt),
-        ]
-
         if on_thought:
             on_thought("正在生成最终回答...")
 
@@ -184,35 +215,162 @@ class GastricRAGAgent:
             response_text = _response_text(response.content)
             reasoning_from_model = _extract_reasoning(response)
 
-        cleaned_text = _clean_output_text(response_text)
-        cleaned_text = re.sub(r"\[\d+]", "", cleaned_text)
-        references, sources = _build_references(retrieved_items)
-        thinking_trace = reasoning_from_model
-        if think_mode and not thinking_trace:
-            thinking_trace = _build_reasoning_fallback(question, retrieved_items)
-        return QAResponse(
-            answer=cleaned_text,
-            sources=sources,
-            references=references,
-            retrieved_items=retrieved_items,
-            thinking_trace=thinking_trace,
+        return _finalize_response(
+            question,
+            think_mode,
+            response_text,
+            reasoning_from_model,
+            retrieved_items,
+            cache_state,
         )
 
-    def _build_llm(self, think_mode: bool) -> ChatOpenAI:
-        if think_mode:
-            return ChatOpenAI(
-                model=self.config.deepseek_reasoner_model,
-                api_key=self.config.deepseek_api_key,
-                base_url=self.config.deepseek_base_url,
+    async def aanswer(
+        self,
+        question: str,
+        think_mode: bool = False,
+        top_k: int = 5,
+        on_thought: Callable[[str], Awaitable[None]] | None = None,
+        on_reasoning_token: Callable[[str], Awaitable[None]] | None = None,
+        on_token: Callable[[str], Awaitable[None]] | None = None,
+        memory_context: str = "",
+    ) -> QAResponse:
+        """Async counterpart of ``answer`` with awaitable callbacks.
+
+        Embedding and Chroma lookups run in a worker thread; generation
+        streams through ``AsyncOpenAI`` so no thread is held while tokens
+        arrive. Cancelling the calling task closes the upstream stream.
+        """
+        if on_thought:
+            await on_thought("正在理解问题意图...")
+
+        normalized_question = _normalize_question(question)
+        cache_state = await asyncio.to_thread(
+            self._check_answer_cache, normalized_question, think_mode, memory_context
+        )
+        if cache_state.cached is not None:
+            if on_thought:
+                await on_thought("命中相似问题的已有回答。")
+            return await _areplay_cached_answer(
+                cache_state.cached, on_reasoning_token, on_token
             )
 
-        return ChatOpenAI(
-            model=self.config.deepseek_chat_model,
-            api_key=self.config.deepseek_api_key,
-            base_url=self.config.deepseek_base_url,
-            temperature=0.1,
+        candidate_count, docs = await asyncio.to_thread(
+            self._retrieve, normalized_question
+        )
+        if on_thought:
+            await on_thought(f"已检索到 {candidate_count} 条候选资料，正在筛选...")
+            await on_thought(f"已筛选出 {len(docs)} 条高相关资料（动态阈值）。")
+
+        if not docs:
+            return _no_answer_response()
+
+        context_lines, retrieved_items = _build_context(docs)
+        messages = _build_messages(question, context_lines, memory_context)
+
+        if on_thought:
+            await on_thought("正在生成最终回答...")
+
+        response_text, reasoning_from_model = await self._astream_completion(
+            think_mode=think_mode,
+            messages=messages,
+            on_token=on_token,
+            on_reasoning_token=on_reasoning_token,
+        )
+        return _finalize_response(
+            question,
+            think_mode,
+            response_text,
+            reasoning_from_model,
+            retrieved_items,
+            cache_state,
         )
 
+    def _check_answer_cache(
+        self, normalized_question: str, think_mode: bool, memory_context: str
+    ) -> _AnswerCacheState:
+        # Personalized answers are never cached, so they cannot leak across users.
+        answer_cache = None if memory_context else get_answer_cache()
+        if answer_cache is None:
+            return _AnswerCacheState()
+        question_embedding = self.embeddings.embed_query(normalized_question)
+        kb_version = read_kb_version(self.persist_dir)
+        return _AnswerCacheState(
+            cache=answer_cache,
+            question_embedding=question_embedding,
+            kb_version=kb_version,
+            cached=answer_cache.lookup(question_embedding, think_mode, kb_version),
+        )
+
+    def _retrieve(self, normalized_question: str) -> tuple[int, list[Any]]:
+        docs_with_scores = self._vector_search(normalized_question, _VECTOR_TOP_K)
+        fused_rank = None
+        if self.sparse_index is not None:
+            docs_with_scores, fused_rank = self._fuse_sparse(
+                normalized_question, docs_with_scores
+            )
+        docs = _select_relevant_docs(normalized_question, docs_with_scores, fused_rank)
+        return len(docs_with_scores), docs
+
+    def _vector_search(self, question: str, k: int) -> list[tuple[Document, float]]:
+        if self.dense_index is not None:
+            return self.dense_index.search(self.embeddings.embed_query(question), k)
+        return self.vectordb.similarity_search_with_relevance_scores(question, k=k)
+
+    def _fuse_sparse(
+        self, normalized_question: str, docs_with_scores: list[tuple[Document, float]]
+    ) -> tuple[list[tuple[Document, float]], dict[str, int]]:
+        """Add BM25 hits to the vector hits and rank both by reciprocal rank fusion.
+
+        BM25-only chunks are scored against the (cached) query embedding the
+        same way Chroma scores its hits, so relevance thresholds still apply.
+        """
+        assert self.sparse_index is not None
+        sparse_ids = [
+            key for key, _ in self.sparse_index.search(normalized_question, _SPARSE_TOP_K)
+        ]
+        vector_ids = [doc.id for doc, _ in docs_with_scores if doc.id is not None]
+        fused = reciprocal_rank_fusion([vector_ids, sparse_ids])
+        known = set(vector_ids)
+        missing = [key for key in sparse_ids if key not in known]
+        if missing:
+            docs_with_scores = docs_with_scores + self._score_chunks(normalized_question, missing)
+        ranking = sorted(fused, key=fused.__getitem__, reverse=True)
+        return docs_with_scores, {key: rank for rank, key in enumerate(ranking)}
+
+    def _score_chunks(self, question: str, ids: list[str]) -> list[tuple[Document, float]]:
+        if self.dense_index is not None:
+            return self.dense_index.score_ids(self.embeddings.embed_query(question), ids)
+        found = self.vectordb._collection.get(
+            ids=ids, include=["documents", "metadatas", "embeddings"]
+        )
+        if not found["ids"]:
+            return []
+        query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        vectors = np.asarray(found["embeddings"], dtype=np.float32)
+        space = _distance_space(self.vectordb)
+        if space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+            distances = 1 - vectors @ query / np.maximum(norms, 1e-12)
+        elif space == "ip":
+            distances = 1 - vectors @ query
+        else:
+            distances = ((vectors - query) ** 2).sum(axis=1)
+        relevance = self.vectordb._select_relevance_score_fn()
+        return [
+            (
+                Document(page_content=text, metadata=metadata or {}, id=key),
+                relevance(float(distance)),
+            )
+            for key, text, metadata, distance in zip(
+                found["ids"], found["documents"] or [], found["metadatas"] or [], distances
+            )
+        ]
+
+    def _build_llm(self, think_mode: bool) -> ChatOpenAI:
+        if think_mode:
+            return self._reasoner_llm
+        return self._chat_llm
+
     @staticmethod
     def _stream_answer(
         llm: ChatOpenAI,
@@ -246,13 +404,9 @@ class GastricRAGAgent:
         on_token: Callable[[str], None],
         on_reasoning_token: Callable[[str], None] | None = None,
     ) -> tuple[str, str]:
-        client = OpenAI(
-            api_key=self.config.deepseek_api_key,
-            base_url=self.config.deepseek_base_url,
-        )
         payload = [_message_to_openai_dict(message) for message in messages]
 
-        stream = client.chat.completions.create(
+        stream = self._client.chat.completions.create(
             model=self.config.deepseek_reasoner_model,
             messages=payload,
             stream=True,
@@ -281,6 +435,206 @@ class GastricRAGAgent:
 
         return "".join(answer_tokens), "".join(reasoning_tokens)
 
+    async def _astream_completion(
+        self,
+        think_mode: bool,
+        messages: list[Any],
+        on_token: Callable[[str], Awaitable[None]] | None,
+        on_reasoning_token: Callable[[str], Awaitable[None]] | None = None,
+    ) -> tuple[str, str]:
+        payload = [_message_to_openai_dict(message) for message in messages]
+        temperature: float | Omit
+        if think_mode:
+            model = self.config.deepseek_reasoner_model
+            temperature = omit
+        else:
+            model = self.config.deepseek_chat_model
+            temperature = 0.1
+
+        if on_token is None:
+            completion = await self._async_client.chat.completions.create(
+                model=model,
+                messages=payload,
+                temperature=temperature,
+            )
+            message = completion.choices[0].message
+            reasoning = getattr(message, "reasoning_content", None)
+            return message.content or "", reasoning if isinstance(reasoning, str) else ""
+
+        stream = await self._async_client.chat.completions.create(
+            model=model,
+            messages=payload,
+            temperature=temperature,
+            stream=True,
+        )
+
+        answer_tokens: list[str] = []
+        reasoning_tokens: list[str] = []
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+
+                delta = chunk.choices[0].delta
+                reasoning_piece = getattr(delta, "reasoning_content", None)
+                if isinstance(reasoning_piece, str) and reasoning_piece:
+                    cleaned_reasoning = _clean_stream_piece(reasoning_piece)
+                    reasoning_tokens.append(cleaned_reasoning)
+                    if on_reasoning_token:
+                        await on_reasoning_token(cleaned_reasoning)
+
+                content_piece = getattr(delta, "content", None)
+                if isinstance(content_piece, str) and content_piece:
+                    cleaned_content = _clean_stream_piece(content_piece)
+                    answer_tokens.append(cleaned_content)
+                    await on_token(cleaned_content)
+        finally:
+            # Also runs on cancellation, releasing the upstream HTTP stream.
+            await stream.close()
+
+        return "".join(answer_tokens), "".join(reasoning_tokens)
+
+
+@dataclass
+class _AnswerCacheState:
+    cache: AnswerCache | None = None
+    question_embedding: list[float] = field(default_factory=list)
+    kb_version: str = ""
+    cached: CachedAnswer | None = None
+
+
+def _distance_space(vectordb: Chroma) -> str:
+    """The collection's distance metric, resolved as ``_select_relevance_score_fn`` does."""
+    configuration = vectordb._collection.configuration
+    hnsw = configuration.get("hnsw")
+    spann = configuration.get("spann")
+    return (hnsw.get("space") if hnsw else None) or (spann.get("space") if spann else None) or "l2"
+
+
+def _no_answer_response() -> QAResponse:
+    return QAResponse(
+        answer="根据当前知识库资料，我无法确定，请咨询医生或补充更多信息。",
+        sources=[],
+        references=[],
+        retrieved_items=[],
+        thinking_trace="",
+    )
+
+
+def _build_context(docs: list[Any]) -> tuple[list[str], list[dict[str, str]]]:
+    context_lines: list[str] = []
+    retrieved_items: list[dict[str, str]] = []
+    for i, doc in enumerate(docs, start=1):
+        source = doc.metadata.get("source", "")
+        title = doc.metadata.get("title", "")
+        snippet = doc.page_content[:200].replace("\n", " ").strip()
+        retrieved_items.append(
+            {
+                "idx": str(i),
+                "title": title or "(untitled)",
+                "source": source,
+                "snippet": snippet,
+            }
+        )
+        context_lines.append(
+            f"[资料{i}] 标题: {title}\n来源: {source}\n内容: {doc.page_content[:1200]}"
+        )
+    return context_lines, retrieved_items
+
+
+def _build_messages(
+    question: str, context_lines: list[str], memory_context: str
+) -> list[Any]:
+    user_prompt = (
+        f"用户问题: {question}\n\n"
+        "以下是检索到的上下文：\n"
+        + "\n\n".join(context_lines)
+        + "\n\n请直接给出回答，不要在正文中使用任何编号引用（如[1]、[2]），也不要输出URL。"
+    )
+
+    system_content = SYSTEM_PROMPT
+    if memory_context:
+        system_content = (
+            SYSTEM_PROMPT
+            + "\n\n"
+            + memory_context
+            + "\n请根据用户个人健康档案给出量身定制的建议。"
+        )
+
+    return [
+        SystemMessage(content=system_content),
+        HumanMessage(content=user_prompt),
+    ]
+
+
+def _finalize_response(
+    question: str,
+    think_mode: bool,
+    response_text: str,
+    reasoning_from_model: str,
+    retrieved_items: list[dict[str, str]],
+    cache_state: _AnswerCacheState,
+) -> QAResponse:
+    cleaned_text = _clean_output_text(response_text)
+    cleaned_text = re.sub(r"\[\d+]", "", cleaned_text)
+    references, sources = _build_references(retrieved_items)
+    thinking_trace = reasoning_from_model
+    if think_mode and not thinking_trace:
+        thinking_trace = _build_reasoning_fallback(question, retrieved_items)
+    response = QAResponse(
+        answer=cleaned_text,
+        sources=sources,
+        references=references,
+        retrieved_items=retrieved_items,
+        thinking_trace=thinking_trace,
+    )
+    if cache_state.cache is not None:
+        cache_state.cache.store(
+            cache_state.question_embedding,
+            think_mode,
+            cache_state.kb_version,
+            response,
+            streamed_reasoning=reasoning_from_model,
+        )
+    return response
+
+
+def _replay_cached_answer(
+    cached: CachedAnswer,
+    on_reasoning_token: Callable[[str], None] | None,
+    on_token: Callable[[str], None] | None,
+) -> QAResponse:
+    response: QAResponse = cached.response
+    if on_reasoning_token:
+        for piece in _split_pieces(cached.streamed_reasoning):
+            on_reasoning_token(piece)
+    if on_token:
+        for piece in _split_pieces(response.answer):
+            on_token(piece)
+    return response
+
+
+async def _areplay_cached_answer(
+    cached: CachedAnswer,
+    on_reasoning_token: Callable[[str], Awaitable[None]] | None,
+    on_token: Callable[[str], Awaitable[None]] | None,
+) -> QAResponse:
+    response: QAResponse = cached.response
+    if on_reasoning_token:
+        for piece in _split_pieces(cached.streamed_reasoning):
+            await on_reasoning_token(piece)
+    if on_token:
+        for piece in _split_pieces(response.answer):
+            await on_token(piece)
+    return response
+
+
+def _split_pieces(text: str) -> list[str]:
+    return [
+        text[i : i + _REPLAY_PIECE_CHARS]
+        for i in range(0, len(text), _REPLAY_PIECE_CHARS)
+    ]
+
 
 def _response_text(content: Any) -> str:
     if isinstance(content, str):
@@ -357,8 +711,17 @@ def _normalize_question(question: str) -> str:
 
 
 def _select_relevant_docs(
-    question: str, docs_with_scores: list[tuple[Any, float]]
+    question: str,
+    docs_with_scores: list[tuple[Any, float]],
+    fused_rank: dict[str, int] | None = None,
 ) -> list[Any]:
+    """Keep docs whose boosted relevance clears the dynamic threshold.
+
+    With ``fused_rank`` (hybrid retrieval) the docs that clear it are ordered
+    by fused rank instead of by relevance. When too few clear it, the best
+    ``_MIN_RESULTS`` by boosted relevance are returned either way, so a
+    penalised or low-scoring BM25 hit never displaces the best vector hit.
+    """
     if not docs_with_scores:
         return []
 
@@ -367,16 +730,17 @@ def _select_relevant_docs(
 
     adjusted: list[tuple[float, Any]] = []
     for doc, raw_score in docs_with_scores:
-        title = str(doc.metadata.get("title", "")).lower()
-        content = str(doc.page_content[:1500]).lower()
-        blob = f"{title} {content}"
+        title = str(doc.metadata.get("title", ""))
+        content = str(doc.page_content[:1500])
 
         score = raw_score
 
-        if is_general_gastric and any(term in blob for term in NON_TARGET_TERMS):
+        if is_general_gastric and (
+            _NON_TARGET_MATCHER.contains(title) or _NON_TARGET_MATCHER.contains(content)
+        ):
             score *= 0.4
 
-        if any(term in title for term in GENERAL_GASTRIC_TERMS):
+        if _GENERAL_GASTRIC_MATCHER.contains(title):
             score = min(score * 1.15, 1.0)
 
         adjusted.append((score, doc))
@@ -393,6 +757,8 @@ def _select_relevant_docs(
 
     if len(selected) < _MIN_RESULTS:
         selected = [doc for _, doc in adjusted[:_MIN_RESULTS]]
+    elif fused_rank is not None:
+        selected.sort(key=lambda doc: fused_rank.get(doc.id, len(fused_rank)))
     if len(selected) > _MAX_RESULTS:
         selected = selected[:_MAX_RESULTS]
 
@@ -401,11 +767,7 @@ def _select_relevant_docs(
 
 def _extract_terms(text: str) -> set[str]:
     lowered = text.lower()
-    terms: set[str] = set()
-
-    for term in GENERAL_GASTRIC_TERMS | NON_TARGET_TERMS:
-        if term in lowered:
-            terms.add(term)
+    terms = _TERM_MATCHER.found(text)
 
     zh_terms = re.findall(r"[\u4e00-\u9fff]{2,6}", lowered)
     terms.update(zh_terms)
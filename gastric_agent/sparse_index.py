@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+SPARSE_ARRAYS_FILE = "bm25.npz"
+SPARSE_META_FILE = "bm25.json"
+
+_TOKEN = re.compile(r"[\u4e00-\u9fff]+|[a-z0-9]+")
+_CJK = re.compile(r"[\u4e00-\u9fff]")
+
+
+def tokenize(text: str, unigrams: bool = True) -> list[str]:
+    """Chinese runs become character bigrams (plus unigrams); other text lowercase words.
+
+    Single-character runs always yield their character, so queries such as
+    ``胃`` still match with ``unigrams=False``.
+    """
+    tokens: list[str] = []
+    for run in _TOKEN.findall(text.lower()):
+        if not _CJK.match(run):
+            tokens.append(run)
+            continue
+        if unigrams or len(run) == 1:
+            tokens.extend(run)
+        tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, held as CSR postings in numpy arrays.
+
+    The BM25 weight of every (term, chunk) posting is computed when the
+    index is built, so a query only gathers the postings of its terms and
+    sums them per chunk with ``np.bincount``. Chunks are indexed with
+    Chinese unigrams and bigrams, but multi-character query runs are looked
+    up by bigrams only: single characters match most chunks and would
+    dominate query time while adding little ranking signal. Everything runs
+    in-process; nothing touches the network.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        terms: list[str],
+        indptr: np.ndarray,
+        postings: np.ndarray,
+        weights: np.ndarray,
+    ) -> None:
+        self.ids = ids
+        self.terms = terms
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+        self._indptr = indptr
+        self._postings = postings
+        self._weights = weights
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls, docs: Iterable[tuple[str, str]], k1: float = 1.5, b: float = 0.75
+    ) -> BM25Index:
+        """Index ``(chunk_id, text)`` pairs."""
+        ids: list[str] = []
+        term_ids: dict[str, int] = {}
+        posting_terms = array("i")
+        posting_docs = array("i")
+        posting_tfs = array("f")
+        lengths = array("f")
+        for doc_index, (chunk_id, text) in enumerate(docs):
+            ids.append(chunk_id)
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                posting_terms.append(term_ids.setdefault(term, len(term_ids)))
+                posting_docs.append(doc_index)
+                posting_tfs.append(tf)
+
+        terms = list(term_ids)
+        term_column = np.frombuffer(posting_terms, dtype=np.int32)
+        order = np.argsort(term_column, kind="stable")
+        postings = np.frombuffer(posting_docs, dtype=np.int32)[order]
+        tfs = np.frombuffer(posting_tfs, dtype=np.float32)[order]
+        doc_freq = np.bincount(term_column, minlength=len(terms))
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=indptr[1:])
+
+        doc_lengths = np.frombuffer(lengths, dtype=np.float32)
+        average_length = float(doc_lengths.mean()) if len(ids) else 1.0
+        idf = np.log1p((len(ids) - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * doc_lengths[postings] / max(average_length, 1.0))
+        weights = np.repeat(idf, doc_freq) * tfs * (k1 + 1) / (tfs + norm)
+        return cls(ids, terms, indptr, postings, weights.astype(np.float32))
+
+    def search(self, query: str, k: int = 20) -> list[tuple[str, float]]:
+        """Return up to ``k`` ``(chunk_id, score)`` pairs, best first."""
+        spans = [
+            (self._indptr[term_id], self._indptr[term_id + 1])
+            for term_id in {self._term_ids.get(term) for term in tokenize(query, unigrams=False)}
+            if term_id is not None
+        ]
+        if not spans or not self.ids:
+            return []
+        docs = np.concatenate([self._postings[start:end] for start, end in spans])
+        weights = np.concatenate([self._weights[start:end] for start, end in spans])
+        scores = np.bincount(docs, weights=weights, minlength=len(self.ids))
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    def save(self, directory: str) -> None:
+        path = Path(directory)
+        np.savez(
+            path / SPARSE_ARRAYS_FILE,
+            indptr=self._indptr,
+            postings=self._postings,
+            weights=self._weights,
+        )
+        (path / SPARSE_META_FILE).write_text(
+            json.dumps({"ids": self.ids, "terms": self.terms}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> BM25Index | None:
+        """Load the index saved in ``directory``, or ``None`` if it has none."""
+        path = Path(directory)
+        if not (path / SPARSE_ARRAYS_FILE).exists() or not (path / SPARSE_META_FILE).exists():
+            return None
+        meta = json.loads((path / SPARSE_META_FILE).read_text(encoding="utf-8"))
+        with np.load(path / SPARSE_ARRAYS_FILE) as arrays:
+            return cls(
+                meta["ids"],
+                meta["terms"],
+                arrays["indptr"],
+                arrays["postings"],
+                arrays["weights"],
+            )
+
+
+def reciprocal_rank_fusion(rankings: Iterable[list[str]], k: int = 60) -> dict[str, float]:
+    """Fuse ranked ID lists: each ID scores ``sum(1 / (k + rank))`` over the lists."""
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return fused
@@ -1,14 +1,29 @@
 from __future__ import annotations
 
 import argparse
+import json
+from itertools import chain
 from pathlib import Path
+from typing import Iterator
 
+from gastric_agent.crawl_cache import (
+    CrawlCache,
+    cache_path_for,
+    changed_urls_path_for,
+    read_changed_urls,
+    write_changed_urls,
+)
+from gastric_agent.crawl_checkpoint import CrawlCheckpoint, checkpoint_path_for
 from gastric_agent.crawler import GastricCrawler
-from gastric_agent.kb_builder import build_vector_db
+from gastric_agent.embedding_pipeline import EmbedProgress
+from gastric_agent.jsonl_store import JsonlWriter
+from gastric_agent.kb_builder import build_vector_db, export_dense_version
+from gastric_agent.near_dup import DEFAULT_THRESHOLD, NearDuplicateIndex, report_path_for
 
 
 DEFAULT_RAW_PATH = "data/raw/gastric_docs.jsonl"
 DEFAULT_DB_DIR = "data/vector_db"
+INDEX_DEDUP_REPORT = "dedup_report.json"
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -19,26 +34,103 @@ def build_parser() -> argparse.ArgumentParser:
     crawl_parser.add_argument("--max-pages", type=int, default=120)
     crawl_parser.add_argument("--min-chars", type=int, default=500)
     crawl_parser.add_argument("--output", default=DEFAULT_RAW_PATH)
+    crawl_parser.add_argument(
+        "--concurrency", type=int, default=4, help="同时进行的最大请求数"
+    )
+    crawl_parser.add_argument(
+        "--resume", action="store_true", help="从上次中断的检查点继续抓取"
+    )
+    crawl_parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="近重复文档的相似度阈值 (MinHash Jaccard)，0 表示不去重",
+    )
 
     index_parser = subparsers.add_parser("index", help="构建向量索引")
     index_parser.add_argument("--input", default=DEFAULT_RAW_PATH)
     index_parser.add_argument("--persist-dir", default=DEFAULT_DB_DIR)
     index_parser.add_argument("--chunk-size", type=int, default=700)
     index_parser.add_argument("--chunk-overlap", type=int, default=120)
+    index_parser.add_argument(
+        "--changed-urls",
+        default="",
+        help="crawl 生成的 *.changed.json，只重建其中变化页面的向量 (隐含 --incremental)",
+    )
+    index_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="只更新有变化的块: 新增/修改的块写入，已删除页面和过期块从索引中移除",
+    )
+    index_parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="近重复文档的相似度阈值 (MinHash Jaccard)，0 表示不去重",
+    )
+
+    export_parser = subparsers.add_parser(
+        "export-dense", help="为已有向量索引导出 numpy 检索所需的向量矩阵"
+    )
+    export_parser.add_argument("--persist-dir", default=DEFAULT_DB_DIR)
 
     prep_parser = subparsers.add_parser("prepare", help="抓取并构建向量索引")
     prep_parser.add_argument("--max-pages", type=int, default=120)
     prep_parser.add_argument("--min-chars", type=int, default=500)
     prep_parser.add_argument("--output", default=DEFAULT_RAW_PATH)
+    prep_parser.add_argument(
+        "--concurrency", type=int, default=4, help="同时进行的最大请求数"
+    )
+    prep_parser.add_argument(
+        "--resume", action="store_true", help="从上次中断的检查点继续抓取"
+    )
     prep_parser.add_argument("--persist-dir", default=DEFAULT_DB_DIR)
     prep_parser.add_argument("--chunk-size", type=int, default=700)
     prep_parser.add_argument("--chunk-overlap", type=int, default=120)
+    prep_parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="近重复文档的相似度阈值 (MinHash Jaccard)，0 表示不去重",
+    )
+
+    jobs_parser = subparsers.add_parser("memory-jobs", help="查看或清空图记忆提取队列")
+    jobs_parser.add_argument("action", choices=["inspect", "drain"])
+    jobs_parser.add_argument(
+        "--ignore-backoff",
+        action="store_true",
+        help="drain 时立即重试处于退避等待中的任务",
+    )
+
+    import_parser = subparsers.add_parser(
+        "memory-import", help="批量导入多个用户的图记忆 (JSONL)"
+    )
+    import_parser.add_argument(
+        "--input",
+        required=True,
+        help='每行一个 {"user_id": ..., "entities": [...], "relations": [...]}',
+    )
+    import_parser.add_argument("--batch-rows", type=int, default=500)
 
     return parser
 
 
-def run_crawl(max_pages: int, min_chars: int, output: str) -> None:
-    crawler = GastricCrawler()
+def run_crawl(
+    max_pages: int,
+    min_chars: int,
+    output: str,
+    concurrency: int = 4,
+    resume: bool = False,
+    dedup_threshold: float = DEFAULT_THRESHOLD,
+) -> str:
+    near_duplicates = NearDuplicateIndex(dedup_threshold) if dedup_threshold > 0 else None
+    crawl_cache = CrawlCache(cache_path_for(output))
+    crawler = GastricCrawler(cache=crawl_cache)
+    checkpoint = CrawlCheckpoint(checkpoint_path_for(output))
+    if not resume:
+        checkpoint.reset()
+    elif not checkpoint.is_empty():
+        print(f"Resuming crawl from {checkpoint.db_path}")
 
     def show_progress(
         saved_docs: int,
@@ -46,6 +138,7 @@ def run_crawl(max_pages: int, min_chars: int, output: str) -> None:
         visited_pages: int,
         queued_pages: int,
         current_url: str,
+        duplicates_dropped: int,
     ) -> None:
         print(
             (
@@ -53,33 +146,169 @@ def run_crawl(max_pages: int, min_chars: int, output: str) -> None:
                 f"saved={saved_docs}/{target_docs} "
                 f"visited={visited_pages} "
                 f"queue={queued_pages} "
+                f"dups={duplicates_dropped} "
                 f"current={current_url[:70]}"
             ),
             end="",
             flush=True,
         )
 
-    docs = crawler.crawl(
-        max_pages=max_pages,
-        min_chars=min_chars,
-        on_progress=show_progress,
-    )
+    changed: list[str] = []
+    unchanged: list[str] = []
+    with JsonlWriter(output) as writer:
+        # Replay docs from an interrupted run so the output matches the checkpoint.
+        docs = chain(
+            checkpoint.iter_docs(),
+            crawler.iter_crawl(
+                max_pages=max_pages,
+                min_chars=min_chars,
+                on_progress=show_progress,
+                concurrency=concurrency,
+                checkpoint=checkpoint,
+                near_duplicates=near_duplicates,
+            ),
+        )
+        for doc in docs:
+            writer.write(doc.to_record())
+            (changed if doc.changed else unchanged).append(doc.url)
+    checkpoint.close()
+    crawl_cache.close()
+
+    changed_path = changed_urls_path_for(output)
+    write_changed_urls(changed_path, changed, unchanged)
     print()
-    Path(output).parent.mkdir(parents=True, exist_ok=True)
-    crawler.save_jsonl(docs, output)
-    print(f"Crawl done: {len(docs)} docs saved to {output}")
+    print(f"Crawl done: {writer.count} docs saved to {output}")
+    print(f"Changed: {len(changed)} docs, unchanged: {len(unchanged)} (see {changed_path})")
+    if near_duplicates is not None:
+        report_path = report_path_for(output)
+        near_duplicates.write_report(report_path)
+        print(
+            f"Near-duplicates skipped: {near_duplicates.removed} in "
+            f"{len(near_duplicates.clusters)} clusters (see {report_path})"
+        )
+    return changed_path
 
 
 def run_index(
-    input_path: str, persist_dir: str, chunk_size: int, chunk_overlap: int
+    input_path: str,
+    persist_dir: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    changed_urls_path: str = "",
+    dedup_threshold: float = DEFAULT_THRESHOLD,
+    incremental: bool = False,
 ) -> None:
-    chunks = build_vector_db(
+    changed_urls = read_changed_urls(changed_urls_path) if changed_urls_path else None
+    near_duplicates = NearDuplicateIndex(dedup_threshold) if dedup_threshold > 0 else None
+
+    def show_progress(progress: EmbedProgress) -> None:
+        eta = progress.eta_seconds
+        print(
+            (
+                "\rEmbedding... "
+                f"chunks={progress.done}/{progress.total} "
+                f"rate={progress.rate:.1f}/s "
+                f"eta={_format_duration(eta) if eta is not None else '-'} "
+                f"cached={progress.cached} "
+                f"retries={progress.retries}"
+            ),
+            end="",
+            flush=True,
+        )
+
+    stats = build_vector_db(
         jsonl_path=input_path,
         persist_dir=persist_dir,
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
+        changed_urls=changed_urls,
+        near_duplicates=near_duplicates,
+        on_progress=show_progress,
+        incremental=incremental,
+    )
+    print()
+    if near_duplicates is not None:
+        report_path = str(Path(persist_dir) / INDEX_DEDUP_REPORT)
+        near_duplicates.write_report(report_path)
+        print(
+            f"Near-duplicates left out: {near_duplicates.removed} in "
+            f"{len(near_duplicates.clusters)} clusters (see {report_path})"
+        )
+    print(
+        f"Embedding store: {stats.cached} cached, {stats.embedded} embedded "
+        f"(hit rate {stats.cache_hit_rate:.1%})"
+    )
+    if stats.version:
+        print(f"Activated index version {stats.version} in {persist_dir}")
+    if stats.versions_removed:
+        print(f"Removed old index versions: {', '.join(stats.versions_removed)}")
+    if incremental or changed_urls is not None:
+        print(
+            f"Index updated in {persist_dir}: pages added={stats.added} "
+            f"updated={stats.updated} deleted={stats.deleted} unchanged={stats.unchanged}; "
+            f"chunks written={stats.chunks} deleted={stats.chunks_deleted}"
+        )
+        return
+    print(f"Index done: {stats.chunks} chunks stored in {persist_dir}")
+
+
+def run_export_dense(persist_dir: str) -> None:
+    version, rows = export_dense_version(persist_dir)
+    print(f"Exported {rows} vectors, activated index version {version}")
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+def run_memory_jobs(action: str, ignore_backoff: bool) -> None:
+    from server.memory_jobs import get_job_queue
+
+    queue = get_job_queue()
+    if action == "drain":
+        handled = queue.drain(ignore_backoff=ignore_backoff)
+        print(f"Drained {handled} memory jobs")
+
+    metrics = queue.metrics()
+    print(
+        "Memory jobs: "
+        f"depth={metrics['depth']} "
+        f"pending={metrics['pending']} "
+        f"running={metrics['running']} "
+        f"done={metrics['done']} "
+        f"failed={metrics['failed']} "
+        f"oldest_age={metrics['oldest_job_age_seconds']}s "
+        f"throughput={metrics['throughput_per_minute']}/min"
+    )
+    for job in queue.failed_jobs():
+        print(
+            f"  failed #{job['id']} user={job['user_id']} "
+            f"attempts={job['attempts']} error={job['error'][:80]}"
+        )
+
+
+def run_memory_import(input_path: str, batch_rows: int) -> None:
+    from server.graph_memory import bulk_import_memories
+
+    def records() -> Iterator[tuple[str, dict[str, list]]]:
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield record["user_id"], {
+                    "entities": record.get("entities", []),
+                    "relations": record.get("relations", []),
+                }
+
+    totals = bulk_import_memories(records(), batch_rows=batch_rows)
+    print(
+        f"Memory import done: users={totals['users']} "
+        f"new_entities={totals['new_entities']} "
+        f"new_relations={totals['new_relations']}"
     )
-    print(f"Index done: {chunks} chunks stored in {persist_dir}")
 
 
 def main() -> None:
@@ -87,16 +316,57 @@ def main() -> None:
     args = parser.parse_args()
 
     if args.command == "crawl":
-        run_crawl(args.max_pages, args.min_chars, args.output)
+        run_crawl(
+            args.max_pages,
+            args.min_chars,
+            args.output,
+            args.concurrency,
+            args.resume,
+            args.dedup_threshold,
+        )
         return
 
     if args.command == "index":
-        run_index(args.input, args.persist_dir, args.chunk_size, args.chunk_overlap)
+        run_index(
+            args.input,
+            args.persist_dir,
+            args.chunk_size,
+            args.chunk_overlap,
+            args.changed_urls,
+            args.dedup_threshold,
+            args.incremental,
+        )
+        return
+
+    if args.command == "export-dense":
+        run_export_dense(args.persist_dir)
         return
 
     if args.command == "prepare":
-        run_crawl(args.max_pages, args.min_chars, args.output)
-        run_index(args.output, args.persist_dir, args.chunk_size, args.chunk_overlap)
+        changed_path = run_crawl(
+            args.max_pages,
+            args.min_chars,
+            args.output,
+            args.concurrency,
+            args.resume,
+            args.dedup_threshold,
+        )
+        run_index(
+            args.output,
+            args.persist_dir,
+            args.chunk_size,
+            args.chunk_overlap,
+            changed_path,
+            args.dedup_threshold,
+        )
+        return
+
+    if args.command == "memory-jobs":
+        run_memory_jobs(args.action, args.ignore_backoff)
+        return
+
+    if args.command == "memory-import":
+        run_memory_import(args.input, args.batch_rows)
         return
 
     parser.error("Unknown command")
@@ -0,0 +1,174 @@
+"""Process-wide pool of warm GastricRAGAgent instances.
+
+Each index root is served by one agent bound to its live version. A
+background thread watches the root's manifest and, when ``main.py index``
+activates a new version, warms an agent for it before swapping it in.
+Requests lease the agent through :func:`leased_agent`; the previous agent
+finishes the requests that hold it and is closed when the last one ends,
+so retired versions do not stay open in a long-running server.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import Any, Iterator
+
+from gastric_agent.config import get_config
+from gastric_agent.index_versions import resolve_index_dir
+from gastric_agent.rag import GastricRAGAgent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERSIST_DIR = "data/vector_db"
+
+_lock = Lock()
+_agents: dict[tuple[str, str, str, str], GastricRAGAgent] = {}
+_leases: dict[GastricRAGAgent, int] = {}
+_retired: set[GastricRAGAgent] = set()
+_status: dict[str, Any] = {
+    "ready": False,
+    "persist_dir": DEFAULT_PERSIST_DIR,
+    "index_dir": "",
+    "chunks": 0,
+    "loaded_at": "",
+    "error": "",
+}
+
+
+def _pool_key(persist_dir: str) -> tuple[str, str, str, str]:
+    cfg = get_config()
+    return (
+        os.path.abspath(persist_dir),
+        cfg.dashscope_embedding_model,
+        cfg.deepseek_chat_model,
+        cfg.deepseek_reasoner_model,
+    )
+
+
+def get_agent(persist_dir: str = DEFAULT_PERSIST_DIR) -> GastricRAGAgent:
+    """Return the shared agent for the live version of this index, creating it once."""
+    key = _pool_key(persist_dir)
+    agent = _agents.get(key)
+    if agent is not None:
+        return agent
+    with _lock:
+        agent = _agents.get(key)
+        if agent is None:
+            agent = GastricRAGAgent(persist_dir=resolve_index_dir(persist_dir))
+            _agents[key] = agent
+    return agent
+
+
+@contextmanager
+def leased_agent(persist_dir: str = DEFAULT_PERSIST_DIR) -> Iterator[GastricRAGAgent]:
+    """Hold the live agent for one request; a reload closes it only after release."""
+    key = _pool_key(persist_dir)
+    if key not in _agents:
+        get_agent(persist_dir)
+    # Read and lease under one lock, so a reload cannot close it in between.
+    with _lock:
+        agent = _agents[key]
+        _leases[agent] = _leases.get(agent, 0) + 1
+    try:
+        yield agent
+    finally:
+        with _lock:
+            _leases[agent] -= 1
+            idle = not _leases[agent]
+            if idle:
+                del _leases[agent]
+            close = idle and agent in _retired
+            if close:
+                _retired.discard(agent)
+        if close:
+            _close_agent(agent)
+
+
+def warm_up(persist_dir: str = DEFAULT_PERSIST_DIR) -> None:
+    """Build the shared agent and load its index; record the result for readiness."""
+    _status.update(ready=False, persist_dir=persist_dir, error="")
+    try:
+        agent = get_agent(persist_dir)
+        chunks = agent.warm_up()
+    except Exception as exc:
+        logger.exception("Failed to warm up RAG agent for %s", persist_dir)
+        _status["error"] = str(exc)
+        return
+    _mark_ready(agent, chunks)
+
+
+def reload_if_changed(persist_dir: str = DEFAULT_PERSIST_DIR) -> bool:
+    """Swap in an agent for a newly activated index version, warmed before the swap."""
+    key = _pool_key(persist_dir)
+    index_dir = resolve_index_dir(persist_dir)
+    current = _agents.get(key)
+    if current is not None and os.path.abspath(current.persist_dir) == os.path.abspath(
+        index_dir
+    ):
+        return False
+    agent = GastricRAGAgent(persist_dir=index_dir)
+    chunks = agent.warm_up()
+    with _lock:
+        previous = _agents.get(key)
+        _agents[key] = agent
+        close = previous is not None and previous not in _leases
+        if previous is not None and not close:
+            _retired.add(previous)
+    _status.update(persist_dir=persist_dir, error="")
+    _mark_ready(agent, chunks)
+    if close and previous is not None:
+        _close_agent(previous)
+    return True
+
+
+def _close_agent(agent: GastricRAGAgent) -> None:
+    index_dir = os.path.abspath(agent.persist_dir)
+    with _lock:
+        # A rollback may have reopened the same version, which shares the
+        # Chroma system; keep it open then.
+        if any(os.path.abspath(live.persist_dir) == index_dir for live in _agents.values()):
+            return
+    try:
+        agent.close()
+    except Exception:
+        logger.exception("Failed to close retired RAG index %s", agent.persist_dir)
+    else:
+        logger.info("Closed retired RAG index %s", agent.persist_dir)
+
+
+def _mark_ready(agent: GastricRAGAgent, chunks: int) -> None:
+    _status.update(
+        ready=True,
+        index_dir=agent.persist_dir,
+        chunks=chunks,
+        loaded_at=datetime.now(timezone.utc).isoformat(),
+    )
+    logger.info("RAG agent ready: %d chunks loaded from %s", chunks, agent.persist_dir)
+
+
+def _warm_up_and_watch(persist_dir: str) -> None:
+    warm_up(persist_dir)
+    interval = get_config().index_reload_interval_seconds
+    if interval <= 0:
+        return
+    while True:
+        time.sleep(interval)
+        try:
+            reload_if_changed(persist_dir)
+        except Exception:
+            # Keep serving the current version; the next check retries.
+            logger.exception("Failed to reload RAG index from %s", persist_dir)
+
+
+def start_warm_up(persist_dir: str = DEFAULT_PERSIST_DIR) -> None:
+    """Warm the pool in the background, then keep following new index versions."""
+    Thread(target=_warm_up_and_watch, args=(persist_dir,), daemon=True).start()
+
+
+def readiness() -> dict[str, Any]:
+    return dict(_status)
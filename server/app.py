@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -9,11 +10,26 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
+from .agent_pool import start_warm_up
+from .graph_memory import start_token_encoding_load
+from .memory_jobs import get_job_queue
 from .routes.auth import router as auth_router
 from .routes.chat import router as chat_router
+from .routes.health import router as health_router
 from .routes.memory import router as memory_router
 
-app = FastAPI(title="胃病智能问答系统")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Load the shared RAG agent once so chat requests skip index start-up.
+    start_warm_up()
+    start_token_encoding_load()
+    get_job_queue().start()
+    yield
+    get_job_queue().stop()
+
+
+app = FastAPI(title="胃病智能问答系统", lifespan=lifespan)
 
 # CORS: allow Vue dev server (port 5173) and production
 app.add_middleware(
@@ -28,6 +44,7 @@ app.add_middleware(
 app.include_router(auth_router)
 app.include_router(chat_router)
 app.include_router(memory_router)
+app.include_router(health_router)
 
 # Serve Vue build output (after npm run build → frontend/dist/)
 FRONTEND_DIST = Path(__file__).resolve().parent.parent / "frontend" / "dist"
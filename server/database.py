@@ -4,7 +4,9 @@ from __future__ import annotations
 
 import logging
 
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 from pymongo.collection import Collection
 from pymongo.database import Database
 from pymongo.errors import ConnectionFailure
@@ -15,6 +17,16 @@ logger = logging.getLogger(__name__)
 
 _client: MongoClient | None = None
 _db: Database | None = None
+_async_client: AsyncMongoClient | None = None
+_async_db: AsyncDatabase | None = None
+
+_INDEXES = [
+    ("users", "username", True),
+    ("conversations", "user_id", False),
+    ("conversations", "updated_at", False),
+    ("messages", "conversation_id", False),
+    ("messages", "created_at", False),
+]
 
 
 def _get_db() -> Database:
@@ -30,15 +42,32 @@ def _get_db() -> Database:
         raise
     _db = _client[cfg.mongo_db_name]
 
-    _db["users"].create_index("username", unique=True)
-    _db["conversations"].create_index("user_id")
-    _db["conversations"].create_index("updated_at")
-    _db["messages"].create_index("conversation_id")
-    _db["messages"].create_index("created_at")
+    for collection, field, unique in _INDEXES:
+        _db[collection].create_index(field, unique=unique)
 
     return _db
 
 
+async def _aget_db() -> AsyncDatabase:
+    """Async handle used by the streaming chat path."""
+    global _async_client, _async_db
+    if _async_db is not None:
+        return _async_db
+    cfg = get_config()
+    try:
+        _async_client = AsyncMongoClient(cfg.mongo_uri, serverSelectionTimeoutMS=5000)
+        await _async_client.admin.command("ping")
+    except ConnectionFailure:
+        logger.error("Failed to connect to MongoDB at %s", cfg.mongo_uri)
+        raise
+    _async_db = _async_client[cfg.mongo_db_name]
+
+    for collection, field, unique in _INDEXES:
+        await _async_db[collection].create_index(field, unique=unique)
+
+    return _async_db
+
+
 def users_col() -> Collection:
     return _get_db()["users"]
 
@@ -49,3 +78,11 @@ def conversations_col() -> Collection:
 
 def messages_col() -> Collection:
     return _get_db()["messages"]
+
+
+async def aconversations_col() -> AsyncCollection:
+    return (await _aget_db())["conversations"]
+
+
+async def amessages_col() -> AsyncCollection:
+    return (await _aget_db())["messages"]
@@ -3,15 +3,38 @@
 from __future__ import annotations
 
 import json
+import logging
 import re
-from typing import Any
+from threading import Lock, Thread
+from typing import Any, Iterable
 
-from neo4j import GraphDatabase
+import tiktoken
+from neo4j import AsyncGraphDatabase, GraphDatabase
 from openai import OpenAI
 
 from gastric_agent.config import get_config
 
+from .memory_cache import CachedMemory, MemoryCache, MemoryContext
+
+logger = logging.getLogger(__name__)
+
 _driver = None
+_async_driver = None
+_openai: OpenAI | None = None
+
+_INDEX_QUERIES = [
+    "CREATE INDEX IF NOT EXISTS FOR (m:MemoryNode) ON (m.user_id)",
+    "CREATE INDEX IF NOT EXISTS FOR (m:MemoryNode) ON (m.name)",
+    "CREATE INDEX IF NOT EXISTS FOR (v:MemoryVersion) ON (v.user_id)",
+]
+
+# Per-user memory snapshots; entries younger than the check interval are
+# served without touching Neo4j, older ones are re-validated by version.
+MEMORY_CACHE_MAX_USERS = 1024
+MEMORY_CACHE_CHECK_SECONDS = 5.0
+memory_cache = MemoryCache(
+    max_users=MEMORY_CACHE_MAX_USERS, check_seconds=MEMORY_CACHE_CHECK_SECONDS
+)
 
 
 def _get_driver():
@@ -24,11 +47,26 @@ def _get_driver():
         auth=(cfg.neo4j_user, cfg.neo4j_password),
     )
     with _driver.session() as session:
-        session.run("CREATE INDEX IF NOT EXISTS FOR (m:MemoryNode) ON (m.user_id)")
-        session.run("CREATE INDEX IF NOT EXISTS FOR (m:MemoryNode) ON (m.name)")
+        for query in _INDEX_QUERIES:
+            session.run(query)
     return _driver
 
 
+async def _get_async_driver():
+    global _async_driver
+    if _async_driver is not None:
+        return _async_driver
+    cfg = get_config()
+    _async_driver = AsyncGraphDatabase.driver(
+        cfg.neo4j_uri,
+        auth=(cfg.neo4j_user, cfg.neo4j_password),
+    )
+    async with _async_driver.session() as session:
+        for query in _INDEX_QUERIES:
+            await session.run(query)
+    return _async_driver
+
+
 EXTRACT_PROMPT = """\
 你是一个医疗信息提取助手。请从用户消息中提取个人健康相关的结构化实体和关系。
 
@@ -56,33 +94,158 @@ EXTRACT_PROMPT = """\
 不要编造信息，只提取明确提到的内容。
 """
 
+BATCH_EXTRACT_PROMPT = (
+    EXTRACT_PROMPT
+    + """
+本次会给出多条相互独立的用户消息，以 [1]、[2] …… 编号。请对每条消息分别提取，
+输出一个 JSON 数组，顺序与编号一致，每个元素的格式同上:
+[{"entities": [], "relations": []}, {"entities": [], "relations": []}]
+"""
+)
+
+
+ENTITY_MERGE_QUERY = """
+UNWIND $rows AS row
+MERGE (e:MemoryNode {user_id: row.uid, name: row.name})
+SET e:Entity, e.entity_type = row.etype, e.properties = row.props,
+    e.updated_at = timestamp()
+"""
+
+RELATION_MERGE_QUERY = """
+UNWIND $rows AS row
+MERGE (s:MemoryNode {user_id: row.uid, name: row.src})
+MERGE (t:MemoryNode {user_id: row.uid, name: row.tgt})
+MERGE (s)-[r:RELATES_TO {relation: row.rel}]->(t)
+SET r.updated_at = timestamp()
+"""
+
+# Bumped in the same transaction as every memory write so caches in other
+# workers can tell their snapshot is stale.
+BUMP_VERSION_QUERY = """
+UNWIND $uids AS uid
+MERGE (v:MemoryVersion {user_id: uid})
+SET v.version = coalesce(v.version, 0) + 1
+"""
+
+VERSION_QUERY = """
+MATCH (v:MemoryVersion {user_id: $uid})
+RETURN v.version AS version
+"""
+
+BULK_IMPORT_BATCH_ROWS = 500
+
+MEMORY_CONTEXT_TOKEN_BUDGET = 400
+MEMORY_CONTEXT_ENCODING = "cl100k_base"
+
+_MEMORY_HEADER = "[用户个人健康档案]"
+
+_TYPE_LABELS = {
+    "age_group": "年龄段",
+    "gender": "性别",
+    "condition": "疾病/症状",
+    "medication": "用药",
+    "allergy": "过敏",
+    "habit": "生活习惯",
+    "family_history": "家族病史",
+    "preference": "偏好",
+}
+
+# Safety-critical facts first when the budget forces a cut.
+_TYPE_PRIORITY = {
+    "allergy": 0,
+    "medication": 1,
+    "condition": 2,
+    "family_history": 3,
+    "age_group": 4,
+    "gender": 4,
+    "habit": 5,
+    "preference": 6,
+}
+
+# Entities and relations in one round trip; aggregation without grouping
+# keys always yields a single row, even for users with no memory.
+MEMORY_QUERY = """
+OPTIONAL MATCH (e:Entity {user_id: $uid})
+WITH collect(CASE WHEN e IS NULL THEN NULL ELSE {
+    id: elementId(e), entity_type: e.entity_type, entity_name: e.name,
+    properties: e.properties, updated_at: e.updated_at
+} END) AS entities
+OPTIONAL MATCH (s:MemoryNode {user_id: $uid})-[r:RELATES_TO]->(t:MemoryNode)
+RETURN entities, collect(CASE WHEN r IS NULL THEN NULL ELSE {
+    id: elementId(r), source: s.name, relation: r.relation, target: t.name,
+    updated_at: r.updated_at
+} END) AS relations
+"""
+
+
+def _get_openai() -> OpenAI:
+    global _openai
+    if _openai is None:
+        cfg = get_config()
+        _openai = OpenAI(api_key=cfg.deepseek_api_key, base_url=cfg.deepseek_base_url)
+    return _openai
+
 
 def extract_entities_from_text(text: str) -> dict[str, list]:
     """Use DeepSeek-chat to extract entities/relations from user text."""
-    cfg = get_config()
-    client = OpenAI(api_key=cfg.deepseek_api_key, base_url=cfg.deepseek_base_url)
+    resp = _get_openai().chat.completions.create(
+        model=get_config().deepseek_chat_model,
+        messages=_extraction_messages(text),
+        temperature=0.0,
+    )
+    return _parse_extraction(resp.choices[0].message.content or "")
+
 
-    resp = client.chat.completions.create(
-        model=cfg.deepseek_chat_model,
+def extract_entities_batch(texts: list[str]) -> list[dict[str, list]]:
+    """Extract several independent messages with a single DeepSeek call.
+
+    Falls back to one call per text when the model's reply does not line up
+    with the numbered inputs.
+    """
+    if len(texts) == 1:
+        return [extract_entities_from_text(texts[0])]
+
+    numbered = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts, start=1))
+    resp = _get_openai().chat.completions.create(
+        model=get_config().deepseek_chat_model,
         messages=[
-            {"role": "system", "content": EXTRACT_PROMPT},
-            {"role": "user", "content": text},
+            {"role": "system", "content": BATCH_EXTRACT_PROMPT},
+            {"role": "user", "content": numbered},
         ],
         temperature=0.0,
     )
+    data = _load_json_reply(resp.choices[0].message.content or "")
+    if not isinstance(data, list) or len(data) != len(texts):
+        return [extract_entities_from_text(text) for text in texts]
+    return [_normalize_extraction(item) for item in data]
+
 
-    raw = resp.choices[0].message.content or ""
+def _extraction_messages(text: str) -> list[Any]:
+    return [
+        {"role": "system", "content": EXTRACT_PROMPT},
+        {"role": "user", "content": text},
+    ]
 
+
+def _parse_extraction(raw: str) -> dict[str, list]:
+    return _normalize_extraction(_load_json_reply(raw))
+
+
+def _load_json_reply(raw: str) -> Any:
     # Extract JSON from possible markdown code block
     json_match = re.search(r"```(?:json)?\s*([\s\S]*?)```", raw)
     if json_match:
         raw = json_match.group(1)
 
     try:
-        data = json.loads(raw.strip())
+        return json.loads(raw.strip())
     except json.JSONDecodeError:
-        return {"entities": [], "relations": []}
+        return None
+
 
+def _normalize_extraction(data: Any) -> dict[str, list]:
+    if not isinstance(data, dict):
+        return {"entities": [], "relations": []}
     return {
         "entities": data.get("entities", []),
         "relations": data.get("relations", []),
@@ -90,167 +253,367 @@ def extract_entities_from_text(text: str) -> dict[str, list]:
 
 
 def save_user_memory(user_id: str, extracted: dict[str, list]) -> dict[str, int]:
+    """Write all entities and relations in one transaction (two UNWIND statements)."""
     driver = _get_driver()
-    new_entities = 0
-    new_relations = 0
+    with driver.session() as session:
+        stats = session.execute_write(
+            _write_memory_rows,
+            _entity_params(user_id, extracted),
+            _relation_params(user_id, extracted),
+        )
+    memory_cache.invalidate(user_id)
+    return stats
+
+
+def bulk_import_memories(
+    records: Iterable[tuple[str, dict[str, list]]],
+    batch_rows: int = BULK_IMPORT_BATCH_ROWS,
+) -> dict[str, int]:
+    """Import memories for many users, committing every ``batch_rows`` rows."""
+    driver = _get_driver()
+    totals = {"users": 0, "new_entities": 0, "new_relations": 0}
+    entity_rows: list[dict[str, str]] = []
+    relation_rows: list[dict[str, str]] = []
 
     with driver.session() as session:
-        for ent in extracted.get("entities", []):
-            entity_type = ent.get("type", "unknown")
-            entity_name = ent.get("name", "")
-            if not entity_name:
-                continue
-
-            props_json = json.dumps(ent.get("properties", {}), ensure_ascii=False)
-            summary = session.run(
-                """
-                MERGE (e:MemoryNode {user_id: $uid, name: $name})
-                SET e:Entity, e.entity_type = $etype, e.properties = $props
-                """,
-                uid=user_id,
-                name=entity_name,
-                etype=entity_type,
-                props=props_json,
-            ).consume()
-            new_entities += summary.counters.nodes_created
-
-        for rel in extracted.get("relations", []):
-            source = rel.get("source", "")
-            relation = rel.get("relation", "")
-            target = rel.get("target", "")
-            if not (source and relation and target):
-                continue
-
-            summary = session.run(
-                """
-                MERGE (s:MemoryNode {user_id: $uid, name: $src})
-                MERGE (t:MemoryNode {user_id: $uid, name: $tgt})
-                MERGE (s)-[r:RELATES_TO {relation: $rel}]->(t)
-                """,
-                uid=user_id,
-                src=source,
-                tgt=target,
-                rel=relation,
-            ).consume()
-            new_relations += summary.counters.relationships_created
 
+        def flush() -> None:
+            if not (entity_rows or relation_rows):
+                return
+            stats = session.execute_write(_write_memory_rows, entity_rows, relation_rows)
+            totals["new_entities"] += stats["new_entities"]
+            totals["new_relations"] += stats["new_relations"]
+            for row in entity_rows + relation_rows:
+                memory_cache.invalidate(row["uid"])
+            entity_rows.clear()
+            relation_rows.clear()
+
+        for user_id, extracted in records:
+            totals["users"] += 1
+            entity_rows.extend(_entity_params(user_id, extracted))
+            relation_rows.extend(_relation_params(user_id, extracted))
+            if len(entity_rows) + len(relation_rows) >= batch_rows:
+                flush()
+        flush()
+
+    return totals
+
+
+def _write_memory_rows(
+    tx: Any,
+    entity_rows: list[dict[str, str]],
+    relation_rows: list[dict[str, str]],
+) -> dict[str, int]:
+    new_entities = 0
+    new_relations = 0
+    if entity_rows:
+        summary = tx.run(ENTITY_MERGE_QUERY, rows=entity_rows).consume()
+        new_entities = summary.counters.nodes_created
+    if relation_rows:
+        summary = tx.run(RELATION_MERGE_QUERY, rows=relation_rows).consume()
+        new_relations = summary.counters.relationships_created
+    uids = sorted({row["uid"] for row in entity_rows + relation_rows})
+    if uids:
+        tx.run(BUMP_VERSION_QUERY, uids=uids).consume()
     return {"new_entities": new_entities, "new_relations": new_relations}
 
 
+def _entity_params(user_id: str, extracted: dict[str, list]) -> list[dict[str, str]]:
+    params: list[dict[str, str]] = []
+    for ent in extracted.get("entities", []):
+        entity_name = ent.get("name", "")
+        if not entity_name:
+            continue
+        params.append(
+            {
+                "uid": user_id,
+                "name": entity_name,
+                "etype": ent.get("type", "unknown"),
+                "props": json.dumps(ent.get("properties", {}), ensure_ascii=False),
+            }
+        )
+    return params
+
+
+def _relation_params(user_id: str, extracted: dict[str, list]) -> list[dict[str, str]]:
+    params: list[dict[str, str]] = []
+    for rel in extracted.get("relations", []):
+        source = rel.get("source", "")
+        relation = rel.get("relation", "")
+        target = rel.get("target", "")
+        if not (source and relation and target):
+            continue
+        params.append({"uid": user_id, "src": source, "tgt": target, "rel": relation})
+    return params
+
+
 def get_user_memory(user_id: str) -> dict[str, list]:
-    driver = _get_driver()
-    entities: list[dict[str, Any]] = []
-    relations: list[dict[str, Any]] = []
+    return _load_memory(user_id).memory
+
+
+async def aget_user_memory(user_id: str) -> dict[str, list]:
+    return (await _aload_memory(user_id)).memory
+
+
+def _load_memory(user_id: str) -> CachedMemory:
+    entry = memory_cache.get_fresh(user_id)
+    if entry is not None:
+        return _with_exact_context(user_id, entry)
 
+    driver = _get_driver()
     with driver.session() as session:
-        entity_rows = session.run(
-            """
-            MATCH (e:Entity {user_id: $uid})
-            RETURN elementId(e) AS id, e.entity_type AS entity_type,
-                   e.name AS entity_name, e.properties AS properties
-            """,
-            uid=user_id,
-        )
-        for row in entity_rows:
-            props_raw = row["properties"] or "{}"
-            try:
-                props = json.loads(props_raw)
-            except (json.JSONDecodeError, TypeError):
-                props = {}
-            entities.append(
-                {
-                    "id": row["id"],
-                    "entity_type": row["entity_type"],
-                    "entity_name": row["entity_name"],
-                    "properties": props,
-                }
-            )
-
-        rel_rows = session.run(
-            """
-            MATCH (s:MemoryNode {user_id: $uid})-[r:RELATES_TO]->(t:MemoryNode)
-            RETURN elementId(r) AS id, s.name AS source,
-                   r.relation AS relation, t.name AS target
-            """,
-            uid=user_id,
+        version = _version_of(session.run(VERSION_QUERY, uid=user_id).single())
+        entry = memory_cache.get_for_version(user_id, version)
+        if entry is not None:
+            return _with_exact_context(user_id, entry)
+        record = session.run(MEMORY_QUERY, uid=user_id).single()
+    return _remember(user_id, version, record)
+
+
+async def _aload_memory(user_id: str) -> CachedMemory:
+    entry = memory_cache.get_fresh(user_id)
+    if entry is not None:
+        return _with_exact_context(user_id, entry)
+
+    driver = await _get_async_driver()
+    async with driver.session() as session:
+        version_result = await session.run(VERSION_QUERY, uid=user_id)
+        version = _version_of(await version_result.single())
+        entry = memory_cache.get_for_version(user_id, version)
+        if entry is not None:
+            return _with_exact_context(user_id, entry)
+        memory_result = await session.run(MEMORY_QUERY, uid=user_id)
+        record = await memory_result.single()
+    return _remember(user_id, version, record)
+
+
+def _with_exact_context(user_id: str, entry: CachedMemory) -> CachedMemory:
+    """Re-render a context budgeted before tiktoken loaded; CJK often costs more."""
+    if not entry.context.estimated or _encoding is None:
+        return entry
+    context = render_memory_context(entry.memory)
+    memory_cache.replace_context(user_id, entry.version, context)
+    return CachedMemory(
+        version=entry.version, memory=entry.memory, context=context, checked_at=0.0
+    )
+
+
+def _version_of(record: Any) -> int:
+    if record is None or record["version"] is None:
+        return 0
+    return int(record["version"])
+
+
+def _remember(user_id: str, version: int, record: Any) -> CachedMemory:
+    memory = {
+        "entities": [_entity_row(row) for row in (record["entities"] if record else [])],
+        "relations": [
+            _relation_row(row) for row in (record["relations"] if record else [])
+        ],
+    }
+    context = render_memory_context(memory)
+    if context.dropped:
+        logger.info(
+            "Memory context for user %s trimmed to %d tokens: dropped %d of %d items",
+            user_id,
+            context.tokens,
+            context.dropped,
+            context.total,
         )
-        for row in rel_rows:
-            relations.append(
-                {
-                    "id": row["id"],
-                    "source": row["source"],
-                    "relation": row["relation"],
-                    "target": row["target"],
-                }
-            )
+    memory_cache.put(user_id, version, memory, context)
+    return CachedMemory(version=version, memory=memory, context=context, checked_at=0.0)
 
-    return {"entities": entities, "relations": relations}
+
+def _entity_row(row: Any) -> dict[str, Any]:
+    props_raw = row["properties"] or "{}"
+    try:
+        props = json.loads(props_raw)
+    except (json.JSONDecodeError, TypeError):
+        props = {}
+    return {
+        "id": row["id"],
+        "entity_type": row["entity_type"],
+        "entity_name": row["entity_name"],
+        "properties": props,
+        "updated_at": row["updated_at"] or 0,
+    }
+
+
+def _relation_row(row: Any) -> dict[str, Any]:
+    return {
+        "id": row["id"],
+        "source": row["source"],
+        "relation": row["relation"],
+        "target": row["target"],
+        "updated_at": row["updated_at"] or 0,
+    }
 
 
 def delete_user_entity(user_id: str, entity_id: str) -> bool:
     driver = _get_driver()
     with driver.session() as session:
-        summary = session.run(
+        deleted = session.execute_write(
+            _delete_and_bump,
             """
             MATCH (e:Entity)
             WHERE elementId(e) = $eid AND e.user_id = $uid
             DETACH DELETE e
             """,
-            eid=entity_id,
-            uid=user_id,
-        ).consume()
-        return summary.counters.nodes_deleted > 0
+            {"eid": entity_id, "uid": user_id},
+        )
+    memory_cache.invalidate(user_id)
+    return deleted
 
 
 def delete_user_relation(user_id: str, relation_id: str) -> bool:
     driver = _get_driver()
     with driver.session() as session:
-        summary = session.run(
+        deleted = session.execute_write(
+            _delete_and_bump,
             """
             MATCH (s:MemoryNode {user_id: $uid})-[r:RELATES_TO]->()
             WHERE elementId(r) = $rid
             DELETE r
             """,
-            rid=relation_id,
-            uid=user_id,
-        ).consume()
-        return summary.counters.relationships_deleted > 0
+            {"rid": relation_id, "uid": user_id},
+        )
+    memory_cache.invalidate(user_id)
+    return deleted
 
 
-def build_memory_context(user_id: str) -> str:
+def _delete_and_bump(tx: Any, query: str, params: dict[str, str]) -> bool:
+    counters = tx.run(query, **params).consume().counters
+    deleted = counters.nodes_deleted > 0 or counters.relationships_deleted > 0
+    if deleted:
+        tx.run(BUMP_VERSION_QUERY, uids=[params["uid"]]).consume()
+    return deleted
+
+
+def build_memory_context(user_id: str) -> MemoryContext:
     """Build a text summary of user's graph memory for injection into prompts."""
-    memory = get_user_memory(user_id)
+    return _load_memory(user_id).context
+
+
+async def abuild_memory_context(user_id: str) -> MemoryContext:
+    return (await _aload_memory(user_id)).context
+
+
+def render_memory_context(
+    memory: dict[str, list], token_budget: int = MEMORY_CONTEXT_TOKEN_BUDGET
+) -> MemoryContext:
+    """Render the highest-ranked memory items that fit in ``token_budget``.
+
+    Items are ranked by entity type (allergies and medications first), then
+    by recency. Relations rank with the type of the entity they point to.
+    """
+    # The encoding only goes from missing to loaded, so checking once suffices.
+    estimated = _encoding is None
+    entities = memory["entities"]
+    relations = memory["relations"]
+    total = len(entities) + len(relations)
+    if not total:
+        return MemoryContext(text="", tokens=0, total=0, dropped=0)
+
+    type_by_name = {e["entity_name"]: e["entity_type"] for e in entities}
+    ranked: list[tuple[int, float, str, dict]] = []
+    for ent in entities:
+        rank = _TYPE_PRIORITY.get(ent["entity_type"], len(_TYPE_PRIORITY))
+        ranked.append((rank, -ent.get("updated_at", 0), "entity", ent))
+    for rel in relations:
+        rank = _TYPE_PRIORITY.get(type_by_name.get(rel["target"], ""), len(_TYPE_PRIORITY))
+        ranked.append((rank + 1, -rel.get("updated_at", 0), "relation", rel))
+    ranked.sort(key=lambda item: (item[0], item[1]))
+
+    kept: list[tuple[str, dict]] = []
+    used = _count_tokens(_MEMORY_HEADER)
+    for _, _, kind, item in ranked:
+        fragment = (
+            f"- {item['entity_name']}"
+            if kind == "entity"
+            else f"  {item['source']} → {item['relation']} → {item['target']}"
+        )
+        cost = _count_tokens(fragment) + 1
+        if used + cost > token_budget:
+            continue
+        kept.append((kind, item))
+        used += cost
+
+    text = _format_memory(kept)
+    # Per-fragment counts are an estimate; trim the tail if the whole is over.
+    while kept and _count_tokens(text) > token_budget:
+        kept.pop()
+        text = _format_memory(kept)
+
+    return MemoryContext(
+        text=text,
+        tokens=_count_tokens(text) if text else 0,
+        total=total,
+        dropped=total - len(kept),
+        estimated=estimated,
+    )
+
 
-    if not memory["entities"] and not memory["relations"]:
+def _format_memory(kept: list[tuple[str, dict]]) -> str:
+    if not kept:
         return ""
 
-    lines = ["[用户个人健康档案]"]
+    lines = [_MEMORY_HEADER]
 
-    # Group entities by type
+    # Group entities by type, in priority order
     by_type: dict[str, list[dict]] = {}
-    for ent in memory["entities"]:
-        t = ent["entity_type"]
-        by_type.setdefault(t, []).append(ent)
-
-    type_labels = {
-        "age_group": "年龄段",
-        "gender": "性别",
-        "condition": "疾病/症状",
-        "medication": "用药",
-        "allergy": "过敏",
-        "habit": "生活习惯",
-        "family_history": "家族病史",
-        "preference": "偏好",
-    }
+    for kind, ent in kept:
+        if kind == "entity":
+            by_type.setdefault(ent["entity_type"], []).append(ent)
 
     for t, ents in by_type.items():
-        label = type_labels.get(t, t)
+        label = _TYPE_LABELS.get(t, t)
         names = [e["entity_name"] for e in ents]
         lines.append(f"- {label}: {', '.join(names)}")
 
-    if memory["relations"]:
+    kept_relations = [rel for kind, rel in kept if kind == "relation"]
+    if kept_relations:
         lines.append("关系:")
-        for rel in memory["relations"]:
+        for rel in kept_relations:
             lines.append(f"  {rel['source']} → {rel['relation']} → {rel['target']}")
 
     return "\n".join(lines)
+
+
+_encoding: Any = None
+_encoding_loader: Thread | None = None
+_encoding_lock = Lock()
+
+
+def load_token_encoding() -> None:
+    """Load the tiktoken encoding used to budget memory context.
+
+    The BPE file is downloaded and parsed on first use, so this runs in a
+    background thread started at server start-up; until it finishes (or if
+    it fails) token counts are estimated from the text length.
+    """
+    global _encoding
+    try:
+        _encoding = tiktoken.get_encoding(MEMORY_CONTEXT_ENCODING)
+    except Exception:
+        logger.warning("tiktoken encoding unavailable, estimating tokens by length")
+
+
+def start_token_encoding_load() -> None:
+    global _encoding_loader
+    with _encoding_lock:
+        if _encoding_loader is not None:
+            return
+        _encoding_loader = Thread(
+            target=load_token_encoding, name="tiktoken-load", daemon=True
+        )
+        _encoding_loader.start()
+
+
+def _count_tokens(text: str) -> int:
+    encoding = _encoding
+    if encoding is None:
+        # Never load inline: this runs on the event loop in the chat path.
+        start_token_encoding_load()
+        # About one token per CJK character.
+        return len(text)
+    return len(encoding.encode(text))
@@ -0,0 +1,99 @@
+"""Bounded per-user cache of graph memory and its rendered prompt context."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any
+
+
+@dataclass
+class MemoryContext:
+    text: str
+    tokens: int
+    total: int
+    dropped: int
+    # Budgeted by text length because the tokenizer was not loaded yet.
+    estimated: bool = False
+
+
+@dataclass
+class CachedMemory:
+    version: int
+    memory: dict[str, list]
+    context: MemoryContext
+    checked_at: float
+
+
+class MemoryCache:
+    """LRU of user memory snapshots tagged with the user's graph version.
+
+    Writes in this process invalidate entries directly. Entries older than
+    ``check_seconds`` must be re-validated against the version counter stored
+    in Neo4j, which catches writes made by other workers.
+    """
+
+    def __init__(self, max_users: int = 1024, check_seconds: float = 5.0) -> None:
+        self.max_users = max_users
+        self.check_seconds = check_seconds
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries: OrderedDict[str, CachedMemory] = OrderedDict()
+        self._lock = Lock()
+
+    def get_fresh(self, user_id: str) -> CachedMemory | None:
+        """Return the entry if it can be served without a version check."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.time() - entry.checked_at > self.check_seconds:
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+    def get_for_version(self, user_id: str, version: int) -> CachedMemory | None:
+        """Return the entry if it matches ``version``, marking it as re-checked."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            entry.checked_at = time.time()
+            self._entries.move_to_end(user_id)
+            self.revalidations += 1
+            return entry
+
+    def put(
+        self, user_id: str, version: int, memory: dict[str, list], context: MemoryContext
+    ) -> None:
+        with self._lock:
+            self._entries[user_id] = CachedMemory(
+                version=version, memory=memory, context=context, checked_at=time.time()
+            )
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def replace_context(self, user_id: str, version: int, context: MemoryContext) -> None:
+        """Swap in a re-rendered context if the entry still holds ``version``."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.version == version:
+                entry.context = context
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_users": self.max_users,
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+            }
@@ -0,0 +1,331 @@
+"""Durable SQLite job queue for graph-memory extraction.
+
+Messages are enqueued per user and processed by a small worker pool. Each
+claim takes several pending jobs at once, extracts all distinct texts with a
+single DeepSeek call, and writes each user's result to Neo4j. Failed batches
+are retried with exponential backoff. Identical pending texts for the same
+user are enqueued once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any
+
+from gastric_agent.config import get_config
+
+from .graph_memory import extract_entities_batch, save_user_memory
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+THROUGHPUT_WINDOW_SECONDS = 300.0
+# A running job claimed longer ago than this is assumed to be orphaned.
+CLAIM_LEASE_SECONDS = 900.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    finished_at REAL,
+    error TEXT NOT NULL DEFAULT '',
+    result TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_memory_jobs_due ON memory_jobs (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_memory_jobs_dedup ON memory_jobs (user_id, text_hash, status);
+CREATE INDEX IF NOT EXISTS idx_memory_jobs_finished ON memory_jobs (finished_at);
+"""
+
+
+class MemoryJobFailed(RuntimeError):
+    """A memory job gave up after ``MAX_ATTEMPTS``; the message is its last error."""
+
+
+class MemoryJobQueue:
+    def __init__(self, db_path: str, workers: int = 2, batch_size: int = 8) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(memory_jobs)")}
+        if "claimed_at" not in columns:
+            self._conn.execute("ALTER TABLE memory_jobs ADD COLUMN claimed_at REAL")
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._stopping = Event()
+        self._threads: list[Thread] = []
+        self._waiters: dict[int, list[Future]] = {}
+
+    # ---------- Producer side ----------
+
+    def enqueue(self, user_id: str, text: str) -> int:
+        with self._lock:
+            job_id = self._enqueue_locked(user_id, text)
+        self._wakeup.set()
+        return job_id
+
+    def submit(self, user_id: str, text: str) -> Future:
+        """Enqueue and return a future resolved with the job result.
+
+        A job that fails permanently sets :class:`MemoryJobFailed` on it.
+        """
+        future: Future = Future()
+        with self._lock:
+            job_id = self._enqueue_locked(user_id, text)
+            self._waiters.setdefault(job_id, []).append(future)
+        self._wakeup.set()
+        return future
+
+    def _enqueue_locked(self, user_id: str, text: str) -> int:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        row = self._conn.execute(
+            """
+            SELECT id FROM memory_jobs
+            WHERE user_id = ? AND text_hash = ? AND status IN ('pending', 'running')
+            """,
+            (user_id, text_hash),
+        ).fetchone()
+        if row:
+            return row[0]
+        now = time.time()
+        cursor = self._conn.execute(
+            """
+            INSERT INTO memory_jobs (user_id, text, text_hash, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (user_id, text, text_hash, now, now),
+        )
+        return int(cursor.lastrowid or 0)
+
+    # ---------- Worker side ----------
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            # Jobs left running by a crashed process go back to the queue once
+            # their lease expires; fresh claims may belong to another worker
+            # process or to `main.py memory-jobs drain`.
+            self._conn.execute(
+                """
+                UPDATE memory_jobs SET status = 'pending'
+                WHERE status = 'running' AND (claimed_at IS NULL OR claimed_at < ?)
+                """,
+                (time.time() - CLAIM_LEASE_SECONDS,),
+            )
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = Thread(target=self._run, name=f"memory-jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads.clear()
+
+    def drain(self, ignore_backoff: bool = False) -> int:
+        """Process due jobs in the calling thread until none are left; return jobs handled."""
+        handled = 0
+        while True:
+            jobs = self._claim(ignore_backoff=ignore_backoff)
+            if not jobs:
+                return handled
+            self._process(jobs)
+            handled += len(jobs)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            jobs = self._claim()
+            if not jobs:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._process(jobs)
+
+    def _claim(self, ignore_backoff: bool = False) -> list[dict[str, Any]]:
+        due_before = float("inf") if ignore_backoff else time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    """
+                    SELECT id, user_id, text, text_hash, attempts FROM memory_jobs
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at, id LIMIT ?
+                    """,
+                    (due_before, self.batch_size),
+                ).fetchall()
+                claimed_at = time.time()
+                self._conn.executemany(
+                    "UPDATE memory_jobs SET status = 'running', claimed_at = ? WHERE id = ?",
+                    [(claimed_at, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            {"id": r[0], "user_id": r[1], "text": r[2], "text_hash": r[3], "attempts": r[4]}
+            for r in rows
+        ]
+
+    def _process(self, jobs: list[dict[str, Any]]) -> None:
+        # Identical texts (e.g. from different users) are extracted once.
+        texts: dict[str, str] = {}
+        for job in jobs:
+            texts.setdefault(job["text_hash"], job["text"])
+        hashes = list(texts)
+        try:
+            extracted = extract_entities_batch([texts[h] for h in hashes])
+        except Exception as exc:
+            logger.warning("Memory extraction batch failed", exc_info=True)
+            for job in jobs:
+                self._retry(job, str(exc))
+            return
+
+        by_hash = dict(zip(hashes, extracted))
+        for job in jobs:
+            result = by_hash[job["text_hash"]]
+            try:
+                saved = {"new_entities": 0, "new_relations": 0}
+                if result["entities"] or result["relations"]:
+                    saved = save_user_memory(job["user_id"], result)
+            except Exception as exc:
+                logger.warning("Saving memory for job %s failed", job["id"], exc_info=True)
+                self._retry(job, str(exc))
+                continue
+            self._finish(job["id"], "done", {"extracted": result, "saved": saved}, "")
+
+    def _retry(self, job: dict[str, Any], error: str) -> None:
+        attempts = job["attempts"] + 1
+        if attempts >= MAX_ATTEMPTS:
+            self._finish(job["id"], "failed", None, error, attempts=attempts)
+            return
+        delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE memory_jobs
+                SET status = 'pending', attempts = ?, next_attempt_at = ?, error = ?
+                WHERE id = ?
+                """,
+                (attempts, time.time() + delay, error, job["id"]),
+            )
+
+    def _finish(
+        self,
+        job_id: int,
+        status: str,
+        result: dict[str, Any] | None,
+        error: str,
+        attempts: int | None = None,
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                """
+                UPDATE memory_jobs
+                SET status = ?, finished_at = ?, result = ?, error = ?,
+                    attempts = COALESCE(?, attempts)
+                WHERE id = ?
+                """,
+                (
+                    status,
+                    time.time(),
+                    json.dumps(result, ensure_ascii=False) if result else "",
+                    error,
+                    attempts,
+                    job_id,
+                ),
+            )
+            waiters = self._waiters.pop(job_id, [])
+        for future in waiters:
+            if future.done():
+                continue
+            if status == "failed":
+                future.set_exception(MemoryJobFailed(error))
+            else:
+                future.set_result(result)
+
+    # ---------- Introspection ----------
+
+    def metrics(self) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            counts = dict(
+                self._conn.execute(
+                    "SELECT status, COUNT(*) FROM memory_jobs GROUP BY status"
+                ).fetchall()
+            )
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM memory_jobs WHERE status IN ('pending', 'running')"
+            ).fetchone()[0]
+            recent = self._conn.execute(
+                "SELECT COUNT(*) FROM memory_jobs WHERE status = 'done' AND finished_at >= ?",
+                (now - THROUGHPUT_WINDOW_SECONDS,),
+            ).fetchone()[0]
+        return {
+            "depth": counts.get("pending", 0) + counts.get("running", 0),
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_job_age_seconds": round(now - oldest, 1) if oldest else 0.0,
+            "throughput_per_minute": round(recent / THROUGHPUT_WINDOW_SECONDS * 60, 2),
+        }
+
+    def failed_jobs(self, limit: int = 20) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT id, user_id, attempts, error, finished_at FROM memory_jobs
+                WHERE status = 'failed' ORDER BY finished_at DESC LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+        return [
+            {"id": r[0], "user_id": r[1], "attempts": r[2], "error": r[3], "finished_at": r[4]}
+            for r in rows
+        ]
+
+
+_queue: MemoryJobQueue | None = None
+_queue_lock = Lock()
+
+
+def get_job_queue() -> MemoryJobQueue:
+    global _queue
+    if _queue is not None:
+        return _queue
+    with _queue_lock:
+        if _queue is None:
+            cfg = get_config()
+            _queue = MemoryJobQueue(
+                db_path=cfg.memory_jobs_path,
+                workers=cfg.memory_jobs_workers,
+                batch_size=cfg.memory_jobs_batch_size,
+            )
+    return _queue
@@ -47,6 +47,7 @@ class MessageOut(BaseModel):
     thinking: str = ""
     sources: list[str] = []
     references: list[dict] = []
+    status: str = "completed"  # "cancelled" when the client disconnected mid-answer
     created_at: str = ""
 
 
@@ -2,33 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+from contextlib import suppress
 from datetime import datetime, timezone
-from queue import Queue
-from threading import Thread
-from typing import Any, Iterator
+from typing import Any, AsyncIterator
 
 from bson import ObjectId
 from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
 
-logger = logging.getLogger(__name__)
+from gastric_agent.rag import QAResponse
 
-from gastric_agent.rag import GastricRAGAgent
+logger = logging.getLogger(__name__)
 
-from ..database import conversations_col, messages_col
-from ..deps import get_current_user_id
-from ..graph_memory import (
-    build_memory_context,
-    extract_entities_from_text,
-    save_user_memory,
+from .. import stream_metrics
+from ..agent_pool import leased_agent
+from ..database import (
+    aconversations_col,
+    amessages_col,
+    conversations_col,
+    messages_col,
 )
+from ..deps import get_current_user_id
+from ..graph_memory import abuild_memory_context
+from ..memory_jobs import get_job_queue
 from ..models import ChatRequest, ConversationOut, MessageOut, RenameRequest
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
-PERSIST_DIR = "data/vector_db"
+STREAM_QUEUE_SIZE = 256
 
 
 # ---------- Conversation CRUD ----------
@@ -94,6 +98,7 @@ def get_messages(conv_id: str, user_id: str = Depends(get_current_user_id)):
             thinking=d.get("thinking", ""),
             sources=d.get("sources", []),
             references=d.get("references", []),
+            status=d.get("status", "completed"),
             created_at=d.get("created_at", ""),
         )
         for d in docs
@@ -104,7 +109,9 @@ def get_messages(conv_id: str, user_id: str = Depends(get_current_user_id)):
 
 
 @router.post("/stream")
-def chat_stream(req: ChatRequest, user_id: str = Depends(get_current_user_id)):
+async def chat_stream(req: ChatRequest, user_id: str = Depends(get_current_user_id)):
+    conversations = await aconversations_col()
+    messages = await amessages_col()
     conv_id = req.conversation_id
 
     # Auto-create conversation if none specified
@@ -116,12 +123,12 @@ def chat_stream(req: ChatRequest, user_id: str = Depends(get_current_user_id)):
             "created_at": now,
             "updated_at": now,
         }
-        result = conversations_col().insert_one(doc)
+        result = await conversations.insert_one(doc)
         conv_id = str(result.inserted_id)
 
     # Save user message
     now = datetime.now(timezone.utc).isoformat()
-    messages_col().insert_one(
+    await messages.insert_one(
         {
             "conversation_id": conv_id,
             "role": "user",
@@ -132,83 +139,166 @@ def chat_stream(req: ChatRequest, user_id: str = Depends(get_current_user_id)):
 
     # Update conversation title only if still default
     title = req.question[:20] + ("..." if len(req.question) > 20 else "")
-    conversations_col().update_one(
+    await conversations.update_one(
         {"_id": ObjectId(conv_id), "title": "新对话"},
         {"$set": {"title": title}},
     )
 
-    queue: Queue[dict[str, Any] | None] = Queue()
+    # Bounded so a slow client pauses generation instead of buffering it all.
+    queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue(
+        maxsize=STREAM_QUEUE_SIZE
+    )
+
+    # Graph-memory extraction is handed to the job queue once the memory
+    # snapshot this request answers with has been read. Its result is
+    # reported on the first emit after the job finishes; the stream never
+    # waits for it.
+    extraction: asyncio.Future[dict[str, Any] | None] | None = None
+    memory_reported = False
+
+    async def report_memory_update() -> None:
+        nonlocal memory_reported
+        if memory_reported or extraction is None or not extraction.done():
+            return
+        memory_reported = True
+        if extraction.exception() is not None:
+            return
+        result = extraction.result()
+        if result and (result["extracted"]["entities"] or result["extracted"]["relations"]):
+            await queue.put(
+                {
+                    "event": "memory_update",
+                    "data": {
+                        "entities": len(result["extracted"]["entities"]),
+                        "relations": len(result["extracted"]["relations"]),
+                    },
+                }
+            )
+
+    async def emit(event: str, data: Any) -> None:
+        await report_memory_update()
+        await queue.put({"event": event, "data": data})
+
+    # Streamed pieces (one per upstream chunk, roughly one token each), kept so
+    # a cancelled generation can still be saved as a truncated message.
+    partial_reasoning: list[str] = []
+    partial_answer: list[str] = []
+
+    async def emit_reasoning(token: str) -> None:
+        partial_reasoning.append(token)
+        await emit("reasoning", token)
+
+    async def emit_answer(token: str) -> None:
+        partial_answer.append(token)
+        await emit("answer", token)
+
+    async def save_cancelled() -> None:
+        streamed = len(partial_reasoning) + len(partial_answer)
+        saved = stream_metrics.record_cancelled(streamed)
+        logger.info(
+            "Client disconnected from conversation %s; generation cancelled "
+            "after %d tokens (~%d saved)",
+            conv_id,
+            streamed,
+            saved,
+        )
+        if not streamed:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        await messages.insert_one(
+            {
+                "conversation_id": conv_id,
+                "role": "assistant",
+                "content": "".join(partial_answer),
+                "thinking": "".join(partial_reasoning),
+                "sources": [],
+                "references": [],
+                "status": "cancelled",
+                "created_at": now,
+            }
+        )
+        await conversations.update_one(
+            {"_id": ObjectId(conv_id)}, {"$set": {"updated_at": now}}
+        )
 
-    def emit(event: str, data: Any) -> None:
-        queue.put({"event": event, "data": data})
+    async def save_completed(response: QAResponse) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        await messages.insert_one(
+            {
+                "conversation_id": conv_id,
+                "role": "assistant",
+                "content": response.answer,
+                "thinking": response.thinking_trace,
+                "sources": response.sources,
+                "references": response.references,
+                "status": "completed",
+                "created_at": now,
+            }
+        )
+        await conversations.update_one(
+            {"_id": ObjectId(conv_id)}, {"$set": {"updated_at": now}}
+        )
 
-    def worker() -> None:
+    async def produce() -> None:
+        nonlocal extraction
         try:
-            # Extract entities from user message (background)
+            # Build personalized context from graph memory as of request start
+            try:
+                memory_context = (await abuild_memory_context(user_id)).text
+            finally:
+                # The durable job outlives this request, so a disconnect
+                # never loses the user's memory.
+                extraction = asyncio.wrap_future(
+                    get_job_queue().submit(user_id, req.question)
+                )
+                # The queue logs failures; don't warn again if the stream
+                # ended before the job did.
+                extraction.add_done_callback(
+                    lambda future: future.cancelled() or future.exception()
+                )
+
             try:
-                extracted = extract_entities_from_text(req.question)
-                if extracted["entities"] or extracted["relations"]:
-                    save_user_memory(user_id, extracted)
-                    emit(
-                        "memory_update",
-                        {
-                            "entities": len(extracted["entities"]),
-                            "relations": len(extracted["relations"]),
-                        },
+                with leased_agent() as agent:
+                    response = await agent.aanswer(
+                        question=req.question,
+                        think_mode=req.think_mode,
+                        top_k=req.top_k,
+                        on_reasoning_token=emit_reasoning,
+                        on_token=emit_answer,
+                        memory_context=memory_context,
                     )
-            except Exception:
-                logger.warning("Memory extraction failed", exc_info=True)
-
-            # Build personalized context from graph memory
-            memory_context = build_memory_context(user_id)
-
-            agent = GastricRAGAgent(persist_dir=PERSIST_DIR)
-            response = agent.answer(
-                question=req.question,
-                think_mode=req.think_mode,
-                top_k=req.top_k,
-                on_reasoning_token=lambda token: emit("reasoning", token),
-                on_token=lambda token: emit("answer", token),
-                memory_context=memory_context,
-            )
+            except asyncio.CancelledError:
+                await save_cancelled()
+                raise
+            stream_metrics.record_completed(len(partial_reasoning) + len(partial_answer))
 
-            emit("references", response.references)
-            emit("sources", response.sources)
-            emit("answer_final", response.answer)
-            emit("conversation_id", conv_id)
-            emit("done", True)
+            # Saved before the final events, and shielded, so a client that
+            # disconnects now still finds the full answer in its history.
+            await asyncio.shield(save_completed(response))
 
-            # Save assistant message
-            messages_col().insert_one(
-                {
-                    "conversation_id": conv_id,
-                    "role": "assistant",
-                    "content": response.answer,
-                    "thinking": response.thinking_trace,
-                    "sources": response.sources,
-                    "references": response.references,
-                    "created_at": datetime.now(timezone.utc).isoformat(),
-                }
-            )
-
-            # Update conversation timestamp
-            conversations_col().update_one(
-                {"_id": ObjectId(conv_id)},
-                {"$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
-            )
+            await emit("references", response.references)
+            await emit("sources", response.sources)
+            await emit("answer_final", response.answer)
+            await emit("conversation_id", conv_id)
+            await emit("done", True)
 
         except Exception as exc:
-            emit("error", str(exc))
-        finally:
-            queue.put(None)
+            await emit("error", str(exc))
+        await queue.put(None)
 
-    Thread(target=worker, daemon=True).start()
-
-    def stream() -> Iterator[str]:
-        while True:
-            item = queue.get()
-            if item is None:
-                break
-            yield json.dumps(item, ensure_ascii=False) + "\n"
+    async def stream() -> AsyncIterator[str]:
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        finally:
+            # Client went away (or stream ended): stop upstream generation.
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
 
     return StreamingResponse(stream(), media_type="application/x-ndjson")
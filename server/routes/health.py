@@ -0,0 +1,41 @@
+"""Health routes: liveness/readiness probes and runtime metrics."""
+
+from __future__ import annotations
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from gastric_agent.answer_cache import get_answer_cache
+from gastric_agent.embedding_cache import get_query_embedding_cache
+
+from .. import stream_metrics
+from ..agent_pool import readiness
+from ..graph_memory import memory_cache
+from ..memory_jobs import get_job_queue
+
+router = APIRouter(prefix="/api/health", tags=["health"])
+
+
+@router.get("/live")
+def live():
+    return {"ok": True}
+
+
+@router.get("/ready")
+def ready():
+    """Report 200 once the vector index is loaded, 503 until then."""
+    info = readiness()
+    code = status.HTTP_200_OK if info["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=code, content=info)
+
+
+@router.get("/metrics")
+def metrics():
+    answer_cache = get_answer_cache()
+    return {
+        "embedding_cache": get_query_embedding_cache().stats(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "generation": stream_metrics.snapshot(),
+        "memory_jobs": get_job_queue().metrics(),
+        "memory_cache": memory_cache.stats(),
+    }
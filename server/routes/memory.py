@@ -3,19 +3,17 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 
 from ..deps import get_current_user_id
-from ..graph_memory import (
-    delete_user_entity,
-    delete_user_relation,
-    extract_entities_from_text,
-    get_user_memory,
-    save_user_memory,
-)
+from ..graph_memory import delete_user_entity, delete_user_relation, get_user_memory
+from ..memory_jobs import MemoryJobFailed, get_job_queue
 from ..models import MemoryEntityOut, MemoryInfoRequest, MemoryRelationOut
 
 router = APIRouter(prefix="/api/memory", tags=["memory"])
 
+EXTRACT_TIMEOUT_SECONDS = 60.0
+
 
 @router.get("")
 def get_memory(user_id: str = Depends(get_current_user_id)):
@@ -32,12 +30,19 @@ def extract_and_save(
     user_id: str = Depends(get_current_user_id),
 ):
     """Manually tell the agent personal info to remember."""
-    extracted = extract_entities_from_text(req.text)
-    stats = save_user_memory(user_id, extracted)
-    return {
-        "extracted": extracted,
-        "saved": stats,
-    }
+    future = get_job_queue().submit(user_id, req.text)
+    try:
+        return future.result(timeout=EXTRACT_TIMEOUT_SECONDS)
+    except TimeoutError:
+        # Still queued (or retrying); the memory is saved once the job succeeds.
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"queued": True, "detail": "信息提取排队中，请稍后刷新"},
+        )
+    except MemoryJobFailed as exc:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY, detail=f"信息提取失败: {exc}"
+        ) from exc
 
 
 @router.delete("/entity/{entity_id}")
@@ -0,0 +1,39 @@
+"""Counters for streamed generations, including ones cut short by disconnects."""
+
+from __future__ import annotations
+
+from threading import Lock
+from typing import Any
+
+_lock = Lock()
+_completed = {"count": 0, "tokens": 0}
+_cancelled = {"count": 0, "tokens_streamed": 0, "tokens_saved": 0}
+
+
+def record_completed(tokens: int) -> None:
+    with _lock:
+        _completed["count"] += 1
+        _completed["tokens"] += tokens
+
+
+def record_cancelled(tokens_streamed: int) -> int:
+    """Count a cancelled generation; return the estimated tokens it saved.
+
+    The estimate is the mean length of completed generations minus what had
+    already been streamed, since the real remainder is never produced.
+    """
+    with _lock:
+        average = _completed["tokens"] / _completed["count"] if _completed["count"] else 0
+        saved = max(int(average) - tokens_streamed, 0)
+        _cancelled["count"] += 1
+        _cancelled["tokens_streamed"] += tokens_streamed
+        _cancelled["tokens_saved"] += saved
+        return saved
+
+
+def snapshot() -> dict[str, Any]:
+    with _lock:
+        return {
+            "completed": dict(_completed),
+            "cancelled": dict(_cancelled),
+        }